@@ -3,11 +3,11 @@
 import logging
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import yaml
 from ops.model import Container
-from ops.pebble import ExecError
+from ops.pebble import ExecError, PathError, Service
 
 from config import AdmissionArgs, AdmissionConfig
 from tls_client import CertificateError, TLSClient
@@ -39,6 +39,7 @@ class Admission:
         logredirect = "--logtostderr"
         port = f"--port={args.admission_port}"
         loglevel = f"-v={args.loglevel}"
+        kube_api = f"--kube-api-qps={args.kube_api_qps:g} --kube-api-burst={args.kube_api_burst}"
         certs = " ".join(self._certificate_args)
 
         extra_args = args.extra_args
@@ -48,7 +49,7 @@ class Admission:
                 sorted(f"--{key}='{value}'" for key, value in extra_args.items())
             )
 
-        self.command = f"{self.binary} {enabled_admission} {certs} {conf} {webhook_namespace} {webhook_service_name} {logredirect} {port} {loglevel}{extra} 2>&1"
+        self.command = f"{self.binary} {enabled_admission} {certs} {conf} {webhook_namespace} {webhook_service_name} {logredirect} {port} {loglevel} {kube_api}{extra} 2>&1"
         return self
 
     def apply(self, charm, config, args):
@@ -58,16 +59,45 @@ class Admission:
         return self
 
     def restart(self, container):
-        """Update pebble layer for container."""
+        """Update pebble layer for container.
+
+        The running service is only restarted when its layer, its config file or its
+        certificates change, since the pod webhook fails closed while it's down.
+        """
         root_rw = dict(permissions=0o644, user_id=0, group_id=0)
+        path, content = self.config_file
+        service_changed = self._service_changed(container)
+        config_changed = self._current_config(container) != content
+
         container.add_layer(container.name, self._layer, combine=True)
-        container.push(*self.config_file, make_dirs=True, **root_rw)
+        if config_changed:
+            container.push(path, content, make_dirs=True, **root_rw)
         if not self.tls.available:
             raise CertificateError()
-        self.tls.prepare(container)
+        certs_changed = self.tls.prepare(container)
+        if not (service_changed or config_changed or certs_changed) and self._running(container):
+            logger.info("Admission service is unchanged, skipping restart")
+            return
         container.autostart()
         container.restart(container.name)
 
+    def _service_changed(self, container: Container) -> bool:
+        current = container.get_plan().services.get(container.name)
+        desired = Service(container.name, self._layer["services"]["volcano"])
+        return current is None or current.to_dict() != desired.to_dict()
+
+    @staticmethod
+    def _current_config(container: Container) -> Optional[str]:
+        try:
+            return container.pull(CONFIG_FILE).read()
+        except PathError:
+            return None
+
+    @staticmethod
+    def _running(container: Container) -> bool:
+        service = container.get_services(container.name).get(container.name)
+        return bool(service and service.is_running())
+
     def executable(self, container) -> bool:
         """Check if container has the appropriate executable."""
         path, file = self.binary.parent, self.binary.name
@@ -15,6 +15,9 @@ develop a new k8s charm using the Operator Framework:
 import logging
 from functools import cached_property
 
+import yaml
+from charms.volcano.v0.manifest_utils import ManifestTimings
+from lightkube.core.exceptions import ApiError
 from ops.charm import CharmBase
 from ops.framework import StoredState
 from ops.interface_tls_certificates.requires import CertificatesRequires
@@ -24,7 +27,13 @@ from ops.pebble import Client as Container
 from ops.pebble import ConnectionError
 
 from admission import Admission
-from config import AdmissionArgs, AdmissionConfig, ConfigError
+from config import (
+    AdmissionArgs,
+    AdmissionConfig,
+    ConfigError,
+    PodWebhookSelectors,
+    WebhookPolicies,
+)
 from manifests import Manifests
 from tls_client import CertificateError, TLSClient, TLSRelation, TLSSelfSigned
 
@@ -48,15 +57,19 @@ class CharmVolcano(CharmBase):
             self_signed_cert=True,  # Assume a self-signed certificate
         )
 
+        self.framework.observe(self.on.config_changed, self._install_or_upgrade)
         self.framework.observe(self.on.upgrade_charm, self._install_or_upgrade)
         self.framework.observe(self.on.volcano_pebble_ready, self._install_or_upgrade)
         self.framework.observe(self.on.update_status, self._update_status)
         self.framework.observe(self.on.leader_elected, self._set_version)
         self.framework.observe(self.on.stop, self._cleanup)
+        self.framework.observe(self.on.diff_manifests_action, self._diff_manifests)
+        self.manifest_timings = ManifestTimings(self)
 
         self.framework.observe(self.on.certificates_relation_created, self._ready_tls)
         self.framework.observe(self.on.certificates_relation_changed, self._ready_tls)
         self.framework.observe(self.on.certificates_relation_broken, self._ready_tls)
+        self.framework.observe(self.on.secret_changed, self._install_or_upgrade)
 
     def _update_status(self, _event):
         container = self.model.unit.get_container(self.CONTAINER)
@@ -98,6 +111,8 @@ class CharmVolcano(CharmBase):
         try:
             app_args = AdmissionArgs.load(self)
             app_config = AdmissionConfig.load(self)
+            PodWebhookSelectors.load(self)
+            WebhookPolicies.load(self)
             admission.apply(self, app_config, app_args)
         except ConfigError as e:
             self.unit.status = BlockedStatus(str(e))
@@ -116,10 +131,19 @@ class CharmVolcano(CharmBase):
         if self.unit.is_leader():
             manifests.apply()
 
+        self._restart(admission, container, event)
+
+    def _restart(self, admission: Admission, container: Container, event):
         try:
             admission.restart(container)
+        except ConfigError as e:
+            self.unit.status = BlockedStatus(str(e))
+            return
         except CertificateError:
             self.unit.status = WaitingStatus("Server certificates not yet ready.")
+            if isinstance(self._tls_client, TLSSelfSigned):
+                # a unit waiting on the leader's secret isn't tracking it for secret-changed
+                event.defer()
             return
         except ConnectionError:
             self.unit.status = WaitingStatus("Failed to connect to admission")
@@ -139,6 +163,17 @@ class CharmVolcano(CharmBase):
         version = Admission(self._tls_client).version(container)
         self.unit.set_workload_version(version)
 
+    def _diff_manifests(self, event):
+        try:
+            changes = Manifests(self).diff()
+        except ConfigError as e:
+            event.fail(str(e))
+            return
+        except ApiError as e:
+            event.fail(f"Failed to diff manifests: {e.status.message}")
+            return
+        event.set_results({"changed": len(changes), "diff": yaml.safe_dump(changes)})
+
     def _cleanup(self, _):
         cont = self.model.unit.get_container(self.CONTAINER)
         if cont and cont.can_connect() and cont.get_services(cont.name):
@@ -1,14 +1,84 @@
 """Digest charm configuration from application and relations."""
+import re
 from dataclasses import asdict, dataclass, field
-from typing import Any, List, Mapping, Optional, TypedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple, TypedDict
 
+import yaml
 from lightkube.models.core_v1 import Toleration
 
+KEY_TYPES = ("rsa", "ecdsa")
+ADMISSIONS = (
+    "/jobs/mutate",
+    "/jobs/validate",
+    "/podgroups/mutate",
+    "/pods/validate",
+    "/pods/mutate",
+    "/queues/mutate",
+    "/queues/validate",
+)
+LABEL_KEY = re.compile(
+    r"^([a-z0-9]([-a-z0-9.]{0,251}[a-z0-9])?/)?[A-Za-z0-9]([-A-Za-z0-9_.]{0,61}[A-Za-z0-9])?$"
+)
+LABEL_VALUE = re.compile(r"^([A-Za-z0-9]([-A-Za-z0-9_.]{0,61}[A-Za-z0-9])?)?$")
+WEBHOOK_RESOURCES = ("jobs", "podgroups", "pods", "queues")
+WEBHOOK_POLICY_VALUES = {  # allowed by admissionregistration.k8s.io/v1
+    "failurePolicy": ("Fail", "Ignore"),
+    "matchPolicy": ("Exact", "Equivalent"),
+    "reinvocationPolicy": ("Never", "IfNeeded"),
+}
+WEBHOOK_TIMEOUT_RANGE = (1, 30)
+
 
 class ConfigError(Exception):
     """Raised when charm has a configuration error."""
 
 
+def _kube_api_limits(charm) -> Tuple[float, int]:
+    """Load the client-side rate limits for the workload's Kubernetes API client."""
+    qps, burst = charm.config["kube-api-qps"], charm.config["kube-api-burst"]
+    if qps <= 0:
+        raise ConfigError("kube-api-qps must be greater than 0")
+    if burst < 1:
+        raise ConfigError("kube-api-burst must be at least 1")
+    return qps, burst
+
+
+def _enabled_admissions(charm) -> List[str]:
+    """Load the enabled admission paths, in the order the admission service lists them."""
+    enabled = set(charm.config["enabled-admissions"].replace(",", " ").split())
+    unknown = sorted(enabled - set(ADMISSIONS))
+    if unknown:
+        raise ConfigError(
+            f"enabled-admissions: unknown admission {unknown[0]!r}, "
+            f"expected any of {', '.join(ADMISSIONS)}"
+        )
+    if not enabled:
+        raise ConfigError("enabled-admissions must enable at least one admission")
+    return [path for path in ADMISSIONS if path in enabled]
+
+
+def _label_expressions(charm, key: str) -> List[Dict[str, Any]]:
+    """Load "key" and "key=value" labels as label selector requirements."""
+    expressions = []
+    for term in charm.config[key].replace(",", " ").split():
+        label, sep, value = term.partition("=")
+        if not LABEL_KEY.match(label) or not LABEL_VALUE.match(value):
+            raise ConfigError(f"{key}: {term!r} isn't a valid key or key=value label")
+        if sep:
+            expressions.append({"key": label, "operator": "In", "values": [value]})
+        else:
+            expressions.append({"key": label, "operator": "Exists"})
+    return expressions
+
+
+def load_key_type(charm) -> str:
+    """Load the key type of self-signed certificates."""
+    key_type = charm.config["self-signed-key-type"]
+    if key_type not in KEY_TYPES:
+        raise ConfigError(f"self-signed-key-type must be one of {', '.join(KEY_TYPES)}")
+    return key_type
+
+
 class ResourceObject(TypedDict):
     """Model config for the Admission plugin."""
 
@@ -49,22 +119,111 @@ DEFAULT_CONFIG = AdmissionConfig(resourceGroups=[])
 class AdmissionArgs:
     """Model command line arguments for the admission."""
 
-    admissions: List[str] = field(
-        default_factory=lambda: [
-            "/jobs/mutate",
-            "/jobs/validate",
-            "/podgroups/mutate",
-            "/pods/validate",
-            "/pods/mutate",
-            "/queues/mutate",
-            "/queues/validate",
-        ]
-    )
+    admissions: List[str] = field(default_factory=lambda: list(ADMISSIONS))
     loglevel: int = 4
     extra_args: dict = field(default_factory=dict)
     admission_port: int = 443
+    kube_api_qps: float = 50.0
+    kube_api_burst: int = 100
 
     @classmethod
     def load(cls, charm) -> "AdmissionArgs":
         """Load admission args from charm config and relations."""
-        return cls()
+        kube_api_qps, kube_api_burst = _kube_api_limits(charm)
+        return cls(
+            admissions=_enabled_admissions(charm),
+            kube_api_qps=kube_api_qps,
+            kube_api_burst=kube_api_burst,
+        )
+
+
+@dataclass
+class PodWebhookSelectors:
+    """Model the label selectors scoping the pod mutate and validate webhooks."""
+
+    namespace_expressions: List[Dict[str, Any]] = field(default_factory=list)
+    object_expressions: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, charm) -> "PodWebhookSelectors":
+        """Load pod webhook selectors from charm config."""
+        return cls(
+            namespace_expressions=_label_expressions(charm, "pod-webhook-namespace-labels"),
+            object_expressions=_label_expressions(charm, "pod-webhook-object-labels"),
+        )
+
+    @property
+    def object_selector(self) -> Dict[str, Any]:
+        """The objectSelector of the pod webhooks."""
+        return {"matchExpressions": self.object_expressions} if self.object_expressions else {}
+
+
+class WebhookPolicy(TypedDict):
+    """Model the call policy of the webhooks of one admission resource."""
+
+    timeoutSeconds: int  # noqa: N815
+    failurePolicy: str  # noqa: N815
+    matchPolicy: str  # noqa: N815
+    reinvocationPolicy: str  # noqa: N815
+
+
+DEFAULT_WEBHOOK_POLICY = WebhookPolicy(
+    timeoutSeconds=10,
+    failurePolicy="Fail",
+    matchPolicy="Equivalent",
+    reinvocationPolicy="Never",
+)
+
+
+def _webhook_policy(resource: str, overrides: Any) -> WebhookPolicy:
+    """Validate a resource's policy overrides, merged over the default policy."""
+    if not isinstance(overrides, dict):
+        raise ConfigError(f"webhook-policies: {resource} must be a mapping")
+    policy = WebhookPolicy(**DEFAULT_WEBHOOK_POLICY)
+    for key, value in overrides.items():
+        if key == "timeoutSeconds":
+            low, high = WEBHOOK_TIMEOUT_RANGE
+            if type(value) is not int or not low <= value <= high:
+                raise ConfigError(
+                    f"webhook-policies: {resource}.timeoutSeconds must be between {low} and {high}"
+                )
+        elif key not in WEBHOOK_POLICY_VALUES:
+            raise ConfigError(f"webhook-policies: {resource}.{key} isn't a webhook policy")
+        elif value not in WEBHOOK_POLICY_VALUES[key]:
+            allowed = ", ".join(WEBHOOK_POLICY_VALUES[key])
+            raise ConfigError(f"webhook-policies: {resource}.{key} must be one of {allowed}")
+        policy[key] = value
+    return policy
+
+
+@dataclass
+class WebhookPolicies:
+    """Model the call policy of the admission webhooks, per admission resource."""
+
+    jobs: WebhookPolicy = field(default_factory=lambda: _webhook_policy("jobs", {}))
+    podgroups: WebhookPolicy = field(default_factory=lambda: _webhook_policy("podgroups", {}))
+    pods: WebhookPolicy = field(default_factory=lambda: _webhook_policy("pods", {}))
+    queues: WebhookPolicy = field(default_factory=lambda: _webhook_policy("queues", {}))
+
+    @classmethod
+    def load(cls, charm) -> "WebhookPolicies":
+        """Load webhook policies from charm config."""
+        try:
+            data = yaml.safe_load(charm.config["webhook-policies"]) or {}
+        except yaml.YAMLError as e:
+            raise ConfigError(
+                f"webhook-policies isn't valid YAML: {getattr(e, 'problem', e)}"
+            ) from e
+        if not isinstance(data, dict):
+            raise ConfigError("webhook-policies must be a mapping of admission resources")
+        unknown = sorted(set(data) - set(WEBHOOK_RESOURCES))
+        if unknown:
+            raise ConfigError(
+                f"webhook-policies: unknown resource {unknown[0]!r}, "
+                f"expected one of {', '.join(WEBHOOK_RESOURCES)}"
+            )
+        return cls(**{r: _webhook_policy(r, p) for r, p in data.items()})
+
+    def asdict(self) -> Mapping[str, Any]:
+        """Return the policies as a mapping."""
+        return asdict(self)
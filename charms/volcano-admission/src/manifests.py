@@ -2,20 +2,38 @@
 
 import logging
 import re
+from functools import partial
 from pathlib import Path
-from typing import List, Sequence
+from typing import Dict, List, Optional, Sequence, Tuple, Type
 
 from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
+from charms.volcano.v0.manifest_utils import (
+    Timings,
+    comparable,
+    delete_collection,
+    diff_fields,
+    run_concurrently,
+)
 from jinja2 import Environment, FileSystemLoader
 from lightkube import Client, codecs
 from lightkube.core.exceptions import ApiError
 from lightkube.core.resource import Resource
 from lightkube.models.core_v1 import ServicePort
+from lightkube.resources.admissionregistration_v1 import (
+    MutatingWebhookConfiguration,
+    ValidatingWebhookConfiguration,
+)
 from lightkube.resources.apps_v1 import StatefulSet
 from ops.charm import CharmBase
 from ops.model import ModelError
 
+from config import AdmissionArgs, PodWebhookSelectors, WebhookPolicies
+
 log = logging.getLogger(__name__)
+OWNER_LABEL = "juju.io/application"
+# every kind of resource this charm applies
+MANAGED_KINDS = (MutatingWebhookConfiguration, ValidatingWebhookConfiguration)
+MAX_DIFF_FIELDS = 50  # changed fields reported per object
 
 
 def _regex_match(value: str, regex: str) -> str:
@@ -40,6 +58,11 @@ class Manifests:
         self.client = Client(namespace=self.namespace, field_manager=self.application)
         self.service_port = ServicePort(443, name=self.application, protocol="TCP")
         self.service_patcher = KubernetesServicePatch(charm, [self.service_port])
+        self.timings = Timings.load(charm)
+
+    @property
+    def _labels(self) -> Dict[str, str]:
+        return {OWNER_LABEL: self.application}
 
     @property
     def _resources(self) -> Sequence[Resource]:
@@ -51,8 +74,12 @@ class Manifests:
         env = Environment(loader=FileSystemLoader("/"))
         env.filters["regexMatch"] = _regex_match
         for _ in templates:
-            rendered = env.get_template(str(_.resolve())).render(context)
-            for obj in codecs.load_all_yaml(rendered):
+            with self.timings.measure("render", "template", _.name):
+                rendered = env.get_template(str(_.resolve())).render(context)
+            with self.timings.measure("parse", "template", _.name):
+                objs = codecs.load_all_yaml(rendered)
+            for obj in objs:
+                obj.metadata.labels = {**(obj.metadata.labels or {}), **self._labels}
                 yield obj
 
     @property
@@ -80,10 +107,14 @@ class Manifests:
 
     @property
     def _config(self) -> dict:
+        pod_selectors = PodWebhookSelectors.load(self._charm)
         return dict(
             custom=dict(
                 admission_enable=True,
-                enabled_admissions="/jobs/mutate,/jobs/validate,/podgroups/mutate,/pods/validate,/pods/mutate,/queues/mutate,/queues/validate",
+                enabled_admissions=",".join(AdmissionArgs.load(self._charm).admissions),
+                pods_namespace_expressions=pod_selectors.namespace_expressions,
+                pods_object_selector=pod_selectors.object_selector,
+                webhooks=WebhookPolicies.load(self._charm).asdict(),
             ),
         )
 
@@ -97,7 +128,9 @@ class Manifests:
     ):
         """Delete a resource."""
         try:
-            self.client.delete(resource_type, name, namespace=namespace)
+            rtype = resource_type._api_info.resource.kind
+            with self.timings.measure("delete", rtype, name):
+                self.client.delete(resource_type, name, namespace=namespace)
         except ApiError as err:
             if err.status.message is not None:
                 err_lower = err.status.message.lower()
@@ -116,17 +149,91 @@ class Manifests:
                 log.exception("ApiError encountered while attempting to delete resource.")
                 raise
         else:
-            rtype = resource_type._api_info.resource.kind
             log.info(f"Deleted {rtype}({name}, namespace={namespace})")
 
     def apply(self):
         """Apply all manifests managed by this charm."""
-        for obj in self._sorted_resources:
-            self.client.apply(obj)
-        for patch in self._sorted_patches:
-            self.client.patch(**patch)
+        try:
+            self._apply()
+        finally:
+            self.timings.save()
+
+    def _apply(self):
+        resources = self._sorted_resources
+        run_concurrently(
+            {
+                f"{obj.kind}({obj.metadata.name})": self.timings.timed(
+                    "apply",
+                    obj.kind,
+                    obj.metadata.name,
+                    partial(self.client.apply, obj),
+                )
+                for obj in resources
+            }
+        )
+        # webhooks of disabled admissions would still be called by the API server
+        for kind, name in self._orphans(resources):
+            self._delete_resource(kind, name, ignore_not_found=True)
+        run_concurrently(
+            {
+                f"{patch['res'].__name__}({patch['name']})": self.timings.timed(
+                    "patch",
+                    patch["res"].__name__,
+                    patch["name"],
+                    partial(self.client.patch, **patch),
+                )
+                for patch in self._sorted_patches
+            }
+        )
         self._patch_service()
 
+    def _orphans(self, resources: List[Resource]) -> List[Tuple[Type[Resource], str]]:
+        """List the objects owned by this charm which are no longer rendered."""
+        rendered = {(type(obj), obj.metadata.name) for obj in resources}
+        return [
+            (kind, obj.metadata.name)
+            for kind in MANAGED_KINDS
+            for obj in self.client.list(kind, labels=self._labels)
+            if (kind, obj.metadata.name) not in rendered
+        ]
+
+    def _get_live(self, obj: Resource) -> Optional[Resource]:
+        try:
+            return self.client.get(type(obj), obj.metadata.name, namespace=obj.metadata.namespace)
+        except ApiError as err:
+            if err.status.code == 404:
+                return None
+            raise
+
+    def diff(self) -> Dict[str, List[str]]:
+        """Report the fields each manifest would change, with a server-side dry-run apply."""
+        changes = {}
+
+        def _record(name, current, dry_run):
+            fields = diff_fields(comparable(current.to_dict()), comparable(dry_run.to_dict()))
+            if len(fields) > MAX_DIFF_FIELDS:
+                more = len(fields) - MAX_DIFF_FIELDS
+                fields = fields[:MAX_DIFF_FIELDS] + [f"... and {more} more"]
+            if fields:
+                changes[name] = fields
+
+        resources = self._sorted_resources
+        for obj in resources:
+            name = f"{obj.kind}({obj.metadata.name})"
+            current = self._get_live(obj)
+            if current is None:
+                changes[name] = ["<created>"]
+            else:
+                _record(name, current, self.client.apply(obj, dry_run=True))
+        for kind, name in self._orphans(resources):
+            changes[f"{kind.__name__}({name})"] = ["<deleted>"]
+
+        for patch in self._sorted_patches:
+            name = f"{patch['res'].__name__}({patch['name']})"
+            current = self.client.get(patch["res"], patch["name"], namespace=patch["namespace"])
+            _record(name, current, self.client.patch(**patch, dry_run=True))
+        return changes
+
     def _patch_service(self):
         # Try to patch the service with juju 3.1 open_port
         # if this fails, try to use the K8S_Service_Patcher lib
@@ -139,7 +246,23 @@ class Manifests:
 
     def delete_manifest(self, ignore_not_found=False, ignore_unauthorized=False):
         """Delete all manifests managed by this charm."""
+        try:
+            self._delete_manifest(ignore_not_found, ignore_unauthorized)
+        finally:
+            self.timings.save()
+
+    def _delete_manifest(self, ignore_not_found, ignore_unauthorized):
+        deleted = {
+            kind
+            for kind in MANAGED_KINDS
+            if delete_collection(
+                self.client, kind, self._labels, self.timings, ignore_unauthorized
+            )
+        }
+        # Fall back to the rendered objects for kinds which couldn't be bulk deleted
         for obj in self._sorted_resources:
+            if type(obj) in deleted:
+                continue
             self._delete_resource(
                 type(obj),
                 obj.metadata.name,
@@ -1,15 +1,28 @@
 """Various ways for the admission webhook service to request a TLS cert package."""
 
 import logging
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List
+from typing import Dict, Mapping, Optional, Union
 
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.x509.oid import NameOID
 from ops.charm import CharmBase
 from ops.interface_tls_certificates.requires import CertificatesRequires
+from ops.model import SecretNotFoundError
 from ops.pebble import Client as Container
-from ops.pebble import ExecError
+from ops.pebble import PathError
+
+from config import load_key_type
 
 log = logging.getLogger(__name__)
+PrivateKey = Union[ec.EllipticCurvePrivateKey, rsa.RSAPrivateKey]
+SECRET_LABEL = "self-signed-certs"
+VALIDITY_DAYS = 3650
+RENEW_BEFORE = timedelta(days=30)
+CLOCK_SKEW = timedelta(minutes=5)
 
 
 class CertificateError(Exception):
@@ -36,8 +49,11 @@ class TLSClient:
         """Path to ca cert file."""
         return self.CERTS / "ca.crt"
 
-    def prepare(self, container: Container) -> None:
-        """Adjust the sidecar container to include the cert package."""
+    def prepare(self, container: Container) -> bool:
+        """Adjust the sidecar container to include the cert package.
+
+        Returns True when the cert package in the container changed.
+        """
         ...  # pragma: no cover
 
     @property
@@ -45,40 +61,149 @@ class TLSClient:
         """Determine if the certificate package is ready."""
         ...  # pragma: no cover
 
+    def _push(self, container: Container, contents: Mapping[Path, str], source: str) -> bool:
+        """Push each file of the cert package into the container, where it differs."""
+        root_rw = dict(make_dirs=True, permissions=0o644, user_id=0, group_id=0)
+        changed = False
+        for path, content in contents.items():
+            try:
+                current = container.pull(path).read()
+            except PathError:
+                current = None
+            if current != content:
+                log.info(f"Copying {path.name} from {source} into sidecar.")
+                container.push(path, content, **root_rw)
+                changed = True
+        return changed
+
+
+def _private_key(key_type: str) -> PrivateKey:
+    if key_type == "ecdsa":
+        return ec.generate_private_key(ec.SECP256R1())
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _pem(key: PrivateKey) -> str:
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
 
 class TLSSelfSigned(TLSClient):
-    """Handles generating self-signed certs package within the sidecar."""
+    """Handles generating a self-signed certs package for the sidecar.
+
+    The package is generated once by the leader and kept in an application secret,
+    so every unit and every restart serves the same CA.
+    """
 
     def __init__(self, charm: CharmBase) -> None:
-        self._binary = "/gen-admission-certs.sh"
-        self._args: List[str] = [
-            "--service",
-            charm.app.name,
-            "--namespace",
-            charm.model.name,
-        ]
+        self._charm = charm
+        # clients verify the SANs, and a common name is limited to 64 characters
+        self._common_name = charm.app.name[:64]
+        self._sans = ",".join(
+            [
+                charm.app.name,
+                f"{charm.app.name}.{charm.model.name}",
+                f"{charm.app.name}.{charm.model.name}.svc",
+            ]
+        )
 
     @property
-    def _content(self) -> str:
-        return Path("templates", self._binary[1:]).read_text()
-
-    def prepare(self, container: Container):
-        """Run generate script in sidecar."""
-        log.info("Generating certs in sidecar.")
-        container.push(
-            self._binary,
-            self._content,
-            permissions=0o755,
-            user_id=0,
-            group_id=0,
+    def _key_type(self) -> str:
+        return load_key_type(self._charm)
+
+    def _stored(self) -> Optional[Dict[str, str]]:
+        try:
+            secret = self._charm.model.get_secret(label=SECRET_LABEL)
+        except SecretNotFoundError:
+            return None
+        return secret.get_content(refresh=True)
+
+    def _current(self, stored: Mapping[str, str]) -> bool:
+        """Whether the stored package matches the config and isn't near expiry."""
+        expiry = datetime.fromisoformat(stored["expiry"])
+        return (
+            stored["sans"] == self._sans
+            and stored.get("key-type", "rsa") == self._key_type
+            and expiry - RENEW_BEFORE > datetime.now(timezone.utc)
         )
-        process = container.exec([self._binary] + self._args)
+
+    def _store(self, content: Dict[str, str]) -> None:
         try:
-            stdout, stderr = process.wait_output()
-        except ExecError as e:
-            log.exception(f"Failed to create certificates: {e.stdout}\n{e.stderr}")
-            raise
-        log.info(f"{stdout}\n-----------\n{stderr}")
+            self._charm.model.get_secret(label=SECRET_LABEL).set_content(content)
+        except SecretNotFoundError:
+            self._charm.app.add_secret(content, label=SECRET_LABEL)
+
+    def prepare(self, container: Container) -> bool:
+        """Push the stored certs into the sidecar, generating them when needed.
+
+        Only the leader generates certs; the other units wait for its secret, and
+        don't push a package the leader is yet to replace.
+        """
+        stored, generated = self._stored(), False
+        if stored is None or not self._current(stored):
+            if not self._charm.unit.is_leader():
+                raise CertificateError("Waiting for the leader to generate certificates")
+            stored, generated = self._generate(), True
+            self._store(stored)
+        contents = {
+            self.ca_cert: stored["ca-cert"],
+            self.cert: stored["cert"],
+            self.private_key: stored["key"],
+        }
+        return self._push(container, contents, "secret") or generated
+
+    def _generate(self) -> Dict[str, str]:
+        """Generate a CA and a server cert signed by it, returning the cert package."""
+        key_type = self._key_type
+        log.info(f"Generating {key_type} certs.")
+        now = datetime.now(timezone.utc)
+        expiry = now + timedelta(days=VALIDITY_DAYS)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, self._common_name)])
+
+        ca_key = _private_key(key_type)
+        ca = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(ca_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - CLOCK_SKEW)
+            .not_valid_after(expiry)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(ca_key, hashes.SHA256())
+        )
+
+        key = _private_key(key_type)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(ca.subject)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - CLOCK_SKEW)
+            .not_valid_after(expiry)
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(
+                x509.ExtendedKeyUsage([x509.oid.ExtendedKeyUsageOID.SERVER_AUTH]), critical=False
+            )
+            .add_extension(
+                x509.SubjectAlternativeName([x509.DNSName(n) for n in self._sans.split(",")]),
+                critical=False,
+            )
+            .sign(ca_key, hashes.SHA256())
+        )
+
+        return {
+            "ca-cert": ca.public_bytes(serialization.Encoding.PEM).decode(),
+            "cert": cert.public_bytes(serialization.Encoding.PEM).decode(),
+            "key": _pem(key),
+            "key-type": key_type,
+            "sans": self._sans,
+            "expiry": expiry.isoformat(),
+        }
 
     @property
     def available(self):
@@ -106,14 +231,15 @@ class TLSRelation(TLSClient):
             self._sans,
         )
 
-    def prepare(self, container: Container):
-        """Copy server cert into the admission container."""
-        log.info("Copying certs from relation into sidecar.")
+    def prepare(self, container: Container) -> bool:
+        """Copy server cert into the admission container, where it differs."""
         cert = self._relation.server_certs_map[self._common_name]
-        root_rw = dict(make_dirs=True, permissions=0o644, user_id=0, group_id=0)
-        container.push(self.ca_cert, self._relation.ca, **root_rw)
-        container.push(self.cert, cert.cert, **root_rw)
-        container.push(self.private_key, cert.key, **root_rw)
+        contents = {
+            self.ca_cert: self._relation.ca,
+            self.cert: cert.cert,
+            self.private_key: cert.key,
+        }
+        return self._push(container, contents, "relation")
 
     @property
     def available(self):
@@ -5,6 +5,7 @@ from ops.pebble import ExecError
 
 from admission import Admission, AdmissionArgs, AdmissionConfig
 from charm import CharmVolcano
+from config import ConfigError
 from tls_client import TLSClient
 
 
@@ -39,7 +40,7 @@ def test_command(harness, admission):
         "--admission-conf=/admission.local.config/volcano-admission.yaml "
         "--webhook-namespace=test_command "
         "--webhook-service-name=volcano-admission "
-        "--logtostderr --port=443 -v=1 --extra='args' 2>&1"
+        "--logtostderr --port=443 -v=1 --kube-api-qps=50 --kube-api-burst=100 --extra='args' 2>&1"
     )
     assert admission.command == cmd
 
@@ -66,6 +67,42 @@ def test_restart(harness, admission):
     assert expected_plan == updated_plan
 
 
+@pytest.fixture
+def running(harness, admission, tls):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    container = harness.model.unit.get_container(CharmVolcano.CONTAINER)
+    admission.command = "mock_command"
+    admission.config = AdmissionConfig([])
+    admission.restart(container)
+    assert container.get_service("volcano").is_running()
+    tls.prepare.return_value = False
+    with mock.patch.object(container, "restart") as mock_restart:
+        yield container, mock_restart
+
+
+def test_restart_unchanged(running, admission):
+    container, mock_restart = running
+    with mock.patch.object(container, "push") as mock_push:
+        admission.restart(container)
+    mock_push.assert_not_called()
+    mock_restart.assert_not_called()
+
+
+@pytest.mark.parametrize("change", ["command", "config", "certs", "stopped"])
+def test_restart_changed(running, admission, tls, change):
+    container, mock_restart = running
+    if change == "command":
+        admission.command = "new_command"
+    elif change == "config":
+        admission.config = AdmissionConfig([dict(resourceGroup="a")])
+    elif change == "certs":
+        tls.prepare.return_value = True
+    else:
+        container.stop("volcano")
+    admission.restart(container)
+    mock_restart.assert_called_once_with("volcano")
+
+
 def test_version_success(harness, admission):
     exec_response = """\
 API Version: v1alpha1
@@ -110,3 +147,30 @@ def test_version_failure(harness, admission, failure):
             mock_process.wait_output.return_value = (exec_response, None)
             version = admission.version(container)
     assert version == "Unknown"
+
+
+def test_command_kube_api_limits(harness, admission):
+    harness.update_config({"kube-api-qps": 500.5, "kube-api-burst": 1000})
+    args = AdmissionArgs.load(harness.charm)
+    admission.apply(harness.charm, AdmissionConfig([]), args)
+    assert " --kube-api-qps=500.5 --kube-api-burst=1000 " in admission.command
+
+
+def test_command_enabled_admissions(harness, admission):
+    harness.update_config({"enabled-admissions": "/queues/validate /jobs/mutate"})
+    args = AdmissionArgs.load(harness.charm)
+    admission.apply(harness.charm, AdmissionConfig([]), args)
+    assert " --enabled-admission=/jobs/mutate,/queues/validate " in admission.command
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        ({"kube-api-qps": 0.0}, "kube-api-qps must be greater than 0"),
+        ({"kube-api-burst": 0}, "kube-api-burst must be at least 1"),
+    ],
+)
+def test_kube_api_limits_invalid(harness, config, message):
+    harness.update_config(config)
+    with pytest.raises(ConfigError, match=message):
+        AdmissionArgs.load(harness.charm)
@@ -1,11 +1,19 @@
+import logging
 import unittest.mock as mock
 
 import pytest
+from charms.volcano.v0.manifest_utils import ManifestError, read_timings
 from lightkube.core.exceptions import ApiError
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.admissionregistration_v1 import (
+    MutatingWebhookConfiguration,
+    ValidatingWebhookConfiguration,
+)
 from lightkube.resources.apps_v1 import StatefulSet
 from ops.model import ModelError
 
-from manifests import Manifests
+from config import ConfigError
+from manifests import MANAGED_KINDS, Manifests
 
 
 @pytest.fixture()
@@ -37,6 +45,90 @@ def test_resources(harness, manifests):
     assert last.webhooks[0].rules[0].resources == ["queues"]
 
 
+def _webhook(manifests, name):
+    (resource,) = [r for r in manifests._resources if r.metadata.name == name]
+    return resource.webhooks[0]
+
+
+def test_pod_webhook_selectors(harness, manifests):
+    pods_mutate = _webhook(manifests, "volcano-admission-service-pods-mutate")
+    assert len(pods_mutate.namespaceSelector.matchExpressions) == 1
+    assert pods_mutate.objectSelector.matchExpressions is None
+
+    harness.update_config(
+        {
+            "pod-webhook-namespace-labels": "volcano.sh/enabled=true",
+            "pod-webhook-object-labels": "volcano.sh/job-name",
+        }
+    )
+    for name in ("pods-mutate", "pods-validate"):
+        webhook = _webhook(manifests, f"volcano-admission-service-{name}")
+        excluded, opt_in = webhook.namespaceSelector.matchExpressions
+        assert excluded.operator == "NotIn"
+        assert (opt_in.key, opt_in.operator, opt_in.values) == (
+            "volcano.sh/enabled",
+            "In",
+            ["true"],
+        )
+        (expression,) = webhook.objectSelector.matchExpressions
+        assert (expression.key, expression.operator) == ("volcano.sh/job-name", "Exists")
+
+    jobs_mutate = _webhook(manifests, "volcano-admission-service-jobs-mutate")
+    assert len(jobs_mutate.namespaceSelector.matchExpressions) == 1
+    assert jobs_mutate.objectSelector.matchExpressions is None
+
+
+def test_pod_webhook_selectors_invalid(harness, manifests):
+    harness.update_config({"pod-webhook-object-labels": "volcano.sh/job-name=a b=/"})
+    with pytest.raises(ConfigError, match="pod-webhook-object-labels: 'b=/' isn't a valid"):
+        list(manifests._resources)
+
+
+def test_webhook_policies(harness, manifests):
+    default = _webhook(manifests, "volcano-admission-service-pods-validate")
+    assert (default.timeoutSeconds, default.failurePolicy) == (10, "Fail")
+
+    harness.update_config(
+        {
+            "webhook-policies": (
+                "pods: {timeoutSeconds: 3, failurePolicy: Ignore}\n"
+                "jobs: {matchPolicy: Exact, reinvocationPolicy: IfNeeded}\n"
+            )
+        }
+    )
+    for name in ("pods-mutate", "pods-validate"):
+        webhook = _webhook(manifests, f"volcano-admission-service-{name}")
+        assert (webhook.timeoutSeconds, webhook.failurePolicy) == (3, "Ignore")
+        assert webhook.matchPolicy == "Equivalent"
+    jobs_mutate = _webhook(manifests, "volcano-admission-service-jobs-mutate")
+    assert (jobs_mutate.matchPolicy, jobs_mutate.reinvocationPolicy) == ("Exact", "IfNeeded")
+    assert jobs_mutate.timeoutSeconds == 10
+    jobs_validate = _webhook(manifests, "volcano-admission-service-jobs-validate")
+    assert jobs_validate.matchPolicy == "Exact"
+    queues_mutate = _webhook(manifests, "volcano-admission-service-queues-mutate")
+    assert (queues_mutate.timeoutSeconds, queues_mutate.failurePolicy) == (10, "Fail")
+
+
+@pytest.mark.parametrize(
+    "policies, message",
+    [
+        ("pods: [", "webhook-policies isn't valid YAML"),
+        ("- pods", "webhook-policies must be a mapping of admission resources"),
+        ("nodes: {}", "unknown resource 'nodes', expected one of jobs, podgroups, pods, queues"),
+        ("pods: Ignore", "pods must be a mapping"),
+        ("pods: {timeoutSeconds: 0}", "pods.timeoutSeconds must be between 1 and 30"),
+        ("pods: {timeoutSeconds: 31}", "pods.timeoutSeconds must be between 1 and 30"),
+        ("pods: {timeoutSeconds: '5'}", "pods.timeoutSeconds must be between 1 and 30"),
+        ("queues: {failurePolicy: fail}", "queues.failurePolicy must be one of Fail, Ignore"),
+        ("jobs: {sideEffects: None}", "jobs.sideEffects isn't a webhook policy"),
+    ],
+)
+def test_webhook_policies_invalid(harness, manifests, policies, message):
+    harness.update_config({"webhook-policies": policies})
+    with pytest.raises(ConfigError, match=message):
+        list(manifests._resources)
+
+
 @pytest.mark.parametrize(
     "open_port", [True, False], ids=["open_port=enabled", "open_port=disabled"]
 )
@@ -49,7 +141,8 @@ def test_apply(lightkube_client, manifests, ksp, open_port):
         manifests._charm.unit, "open_port", side_effect=open_port_se
     ) as mock_open_port:
         manifests.apply()
-    calls = lightkube_client.apply.call_args_list
+    # objects are applied concurrently, so the call order isn't deterministic
+    calls = sorted(lightkube_client.apply.call_args_list, key=lambda c: c.args[0].metadata.name)
     assert len(calls) == 7
     (first,) = calls[0].args
     (last,) = calls[-1].args
@@ -77,9 +170,71 @@ def test_apply(lightkube_client, manifests, ksp, open_port):
         ksp._patch.assert_called_once_with()
 
 
-def test_successful_delete_resources(manifests, caplog):
+def test_apply_aggregates_errors(lightkube_client, manifests):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Apply Failure")
+
+    def apply_se(obj):
+        if obj.metadata.name.endswith("-validate"):
+            raise ApiError(response=mock_response)
+
+    lightkube_client.apply.side_effect = apply_se
+    with pytest.raises(ManifestError) as exc_info:
+        manifests.apply()
+
+    assert len(lightkube_client.apply.call_args_list) == 7
+    assert sorted(exc_info.value.errors) == [
+        "ValidatingWebhookConfiguration(volcano-admission-service-jobs-validate)",
+        "ValidatingWebhookConfiguration(volcano-admission-service-pods-validate)",
+        "ValidatingWebhookConfiguration(volcano-admission-service-queues-validate)",
+    ]
+    lightkube_client.patch.assert_not_called()
+
+
+def test_delete_collections(lightkube_client, manifests, caplog):
+    manifests.delete_manifest(ignore_not_found=True)
+    lightkube_client.delete.assert_not_called()
+    calls = lightkube_client._client.request.call_args_list
+    assert [c.kwargs["res"] for c in calls] == list(MANAGED_KINDS)
+    for c in calls:
+        assert c.args == ("deletecollection",)
+        assert c.kwargs["params"] == {"labelSelector": "juju.io/application=volcano-admission"}
+    assert [message for _, _, message in caplog.record_tuples] == [
+        "Deleted MutatingWebhookConfiguration collection (juju.io/application=volcano-admission)",
+        "Deleted ValidatingWebhookConfiguration collection (juju.io/application=volcano-admission)",
+    ]
+
+
+def test_delete_collections_fallback(lightkube_client, manifests):
+    # lightkube's internals changed, so objects are deleted one at a time
+    del lightkube_client._client
+    manifests.delete_manifest(ignore_not_found=True)
+    deleted = {c.args[0] for c in lightkube_client.delete.call_args_list}
+    assert deleted == set(MANAGED_KINDS)
+    assert lightkube_client.delete.call_count == 7
+
+
+def test_unauthorized_delete_collections(lightkube_client, manifests, caplog):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock (unauthorized)")
+    lightkube_client._client.request.side_effect = ApiError(response=mock_response)
+    manifests.delete_manifest(ignore_unauthorized=True)
+    lightkube_client.delete.assert_not_called()
+    for _, _, message in caplog.record_tuples:
+        assert message == "Ignoring unauthorized error: Mock (unauthorized)"
+
+
+@pytest.fixture()
+def no_collections(lightkube_client):
+    # Deleting by label fails, so objects are deleted one at a time
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Method Not Allowed")
+    lightkube_client._client.request.side_effect = ApiError(response=mock_response)
+
+
+def test_successful_delete_resources(manifests, no_collections, caplog):
     manifests.delete_manifest(ignore_not_found=True)
-    _, _, first = caplog.record_tuples[0]
+    _, _, first = caplog.record_tuples[2]
     _, _, last = caplog.record_tuples[-1]
     assert (
         first
@@ -91,48 +246,152 @@ def test_successful_delete_resources(manifests, caplog):
     )
 
 
-def test_unfound_delete_resources(lightkube_client, manifests, caplog):
+def test_unfound_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict(message="Mock Not Found")
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     manifests.delete_manifest(ignore_not_found=True)
-    for _, _, message in caplog.record_tuples:
+    for _, _, message in caplog.record_tuples[2:]:
         assert message == "Ignoring not found error: Mock Not Found"
 
 
-def test_unauthorized_delete_resources(lightkube_client, manifests, caplog):
+def test_unauthorized_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict(message="Mock (unauthorized)")
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     manifests.delete_manifest(ignore_unauthorized=True)
-    for _, _, message in caplog.record_tuples:
+    for _, _, message in caplog.record_tuples[2:]:
         assert message == "Ignoring unauthorized error: Mock (unauthorized)"
 
 
-def test_unexpected_delete_resources(lightkube_client, manifests, caplog):
+def test_unexpected_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict(message="Mock Simple Failure")
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     with pytest.raises(ApiError):
         manifests.delete_manifest(ignore_unauthorized=True)
-    assert len(caplog.record_tuples) == 1
-    _, _, exception = caplog.record_tuples[0]
+    assert len(caplog.record_tuples) == 3
+    _, _, exception = caplog.record_tuples[2]
     assert (
         exception
         == "ApiError encountered while attempting to delete resource: Mock Simple Failure"
     )
 
 
-def test_no_message_delete_resources(lightkube_client, manifests, caplog):
+def test_no_message_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict()
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     with pytest.raises(ApiError):
         manifests.delete_manifest(ignore_unauthorized=True)
-    assert len(caplog.record_tuples) == 1
-    _, _, exception = caplog.record_tuples[0]
+    assert len(caplog.record_tuples) == 3
+    _, _, exception = caplog.record_tuples[2]
     assert exception == "ApiError encountered while attempting to delete resource."
+
+
+def test_diff(lightkube_client, manifests):
+    created, changed, *unchanged = manifests._sorted_resources
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Not Found", code=404)
+    live_sts = mock.MagicMock()
+    live_sts.to_dict.return_value = {
+        "spec": {"template": {"spec": {"priorityClassName": "system-cluster-critical"}}}
+    }
+
+    def get(res, name, namespace=None):
+        if res is StatefulSet:
+            return live_sts
+        if name == created.metadata.name:
+            raise ApiError(response=mock_response)
+        obj = next(o for o in manifests._sorted_resources if o.metadata.name == name)
+        obj.metadata.resourceVersion = "1"
+        return obj
+
+    def dry_run_apply(obj, dry_run):
+        assert dry_run
+        applied = type(obj).from_dict(obj.to_dict())
+        applied.metadata.resourceVersion = "2"
+        if obj.metadata.name == changed.metadata.name:
+            applied.webhooks[0].timeoutSeconds = 30
+        return applied
+
+    def live(kind, labels):
+        if kind is MutatingWebhookConfiguration:
+            return [kind(metadata=ObjectMeta(name="volcano-admission-service-nodes-mutate"))]
+        return []
+
+    lightkube_client.get.side_effect = get
+    lightkube_client.apply.side_effect = dry_run_apply
+    lightkube_client.patch.return_value = live_sts
+    lightkube_client.list.side_effect = live
+
+    changes = manifests.diff()
+    assert changes == {
+        f"{created.kind}({created.metadata.name})": ["<created>"],
+        f"{changed.kind}({changed.metadata.name})": ["webhooks[0].timeoutSeconds"],
+        "MutatingWebhookConfiguration(volcano-admission-service-nodes-mutate)": ["<deleted>"],
+    }
+    assert lightkube_client.apply.call_count == len(unchanged) + 1
+    assert lightkube_client.patch.call_args.kwargs["dry_run"] is True
+
+
+def test_enabled_admissions(harness, manifests):
+    harness.update_config({"enabled-admissions": "/pods/mutate, /jobs/mutate"})
+    assert [r.metadata.name for r in manifests._sorted_resources] == [
+        "volcano-admission-service-jobs-mutate",
+        "volcano-admission-service-pods-mutate",
+    ]
+
+
+@pytest.mark.parametrize(
+    "admissions, message",
+    [
+        ("/jobs/mutate,/nodes/mutate", "unknown admission '/nodes/mutate', expected any of"),
+        (" , ", "enabled-admissions must enable at least one admission"),
+    ],
+)
+def test_enabled_admissions_invalid(harness, manifests, admissions, message):
+    harness.update_config({"enabled-admissions": admissions})
+    with pytest.raises(ConfigError, match=message):
+        list(manifests._resources)
+
+
+def test_apply_deletes_disabled_admissions(harness, lightkube_client, manifests, ksp):
+    harness.update_config({"enabled-admissions": "/jobs/mutate,/jobs/validate"})
+
+    def live(kind, labels):
+        assert labels == manifests._labels
+        names = {
+            MutatingWebhookConfiguration: ["jobs-mutate", "pods-mutate"],
+            ValidatingWebhookConfiguration: ["jobs-validate"],
+        }[kind]
+        return [kind(metadata=ObjectMeta(name=f"volcano-admission-service-{n}")) for n in names]
+
+    lightkube_client.list.side_effect = live
+    manifests.apply()
+    lightkube_client.delete.assert_called_once_with(
+        MutatingWebhookConfiguration, "volcano-admission-service-pods-mutate", namespace=None
+    )
+
+
+def test_apply_records_timings(lightkube_client, harness, ksp, manifest_timings, caplog):
+    caplog.set_level(logging.INFO)
+    harness.update_config({"manifest-timings": True})
+    Manifests(harness.charm).apply()
+    timings = read_timings(harness.charm.charm_dir)
+    operations = [record["operation"] for record in timings]
+    assert operations[:2] == ["render", "parse"]
+    assert operations.count("apply") == 7
+    assert operations.count("patch") == 1
+    assert "Timing operation=apply kind=MutatingWebhookConfiguration" in caplog.text
+
+
+def test_timings_disabled(lightkube_client, manifests, manifest_timings):
+    manifests.apply()
+    manifests.delete_manifest()
+    assert manifests.timings.records == []
+    assert not manifest_timings.exists()
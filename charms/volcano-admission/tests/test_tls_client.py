@@ -1,29 +1,146 @@
 import unittest.mock as mock
+from datetime import datetime, timedelta, timezone
 
-from tls_client import TLSRelation, TLSSelfSigned
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from ops.pebble import PathError
+from ops.testing import Harness
+
+from charm import CharmVolcano
+from config import ConfigError
+from tls_client import SECRET_LABEL, CertificateError, TLSRelation, TLSSelfSigned
 
 
 def test_self_signed_available(harness):
     self_signed = TLSSelfSigned(harness.charm)
-    assert "gen-admission-certs.sh" in self_signed._binary
-    assert "--service" in self_signed._args
-    assert "--namespace" in self_signed._args
     assert self_signed.available is True
 
 
-def test_self_signed_prepare(harness):
-    mock_container = mock.MagicMock()
-    mock_container.exec().wait_output.return_value = "stdout", "stderr"
-    with mock.patch.object(TLSSelfSigned, "_content") as mock_content:
-        self_signed = TLSSelfSigned(harness.charm)
-        self_signed.prepare(mock_container)
-    mock_container.push.assert_called_once_with(
-        self_signed._binary,
-        mock_content,
-        permissions=0o755,
-        user_id=0,
-        group_id=0,
-    )
+def _certs_container(contents):
+    container = mock.MagicMock()
+
+    def pull(path):
+        if path not in contents:
+            raise PathError("not-found", str(path))
+        return mock.MagicMock(**{"read.return_value": contents[path]})
+
+    container.pull.side_effect = pull
+    return container
+
+
+GENERATED = {
+    TLSSelfSigned.CERTS / "ca.crt": "ca",
+    TLSSelfSigned.CERTS / "server.crt": "cert",
+    TLSSelfSigned.CERTS / "server.key": "key",
+}
+
+
+def _stored_certs(harness, **overrides):
+    name, model = harness.charm.app.name, harness.charm.model.name
+    expiry = datetime.now(timezone.utc) + timedelta(days=365)
+    content = {
+        "ca-cert": "ca",
+        "cert": "cert",
+        "key": "key",
+        "key-type": "rsa",
+        "sans": f"{name},{name}.{model},{name}.{model}.svc",
+        "expiry": expiry.isoformat(),
+        **overrides,
+    }
+    harness.charm.app.add_secret(content, label=SECRET_LABEL)
+
+
+@pytest.mark.parametrize(
+    "key_type, key_class", [("rsa", rsa.RSAPublicKey), ("ecdsa", ec.EllipticCurvePublicKey)]
+)
+def test_self_signed_prepare(harness, key_type, key_class):
+    harness.update_config({"self-signed-key-type": key_type})
+    mock_container = _certs_container({})
+    self_signed = TLSSelfSigned(harness.charm)
+    assert self_signed.prepare(mock_container) is True
+    assert mock_container.push.call_count == 3
+
+    stored = harness.charm.model.get_secret(label=SECRET_LABEL).get_content()
+    ca = x509.load_pem_x509_certificate(stored["ca-cert"].encode())
+    cert = x509.load_pem_x509_certificate(stored["cert"].encode())
+    cert.verify_directly_issued_by(ca)
+    assert isinstance(cert.public_key(), key_class)
+    sans = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    assert ",".join(sans.get_values_for_type(x509.DNSName)) == self_signed._sans
+    assert stored["key-type"] == key_type
+
+
+def test_self_signed_prepare_long_model_name():
+    harness = Harness(CharmVolcano)
+    harness.set_leader(is_leader=True)
+    harness.set_model_name("m" * 63)
+    harness.begin()
+    assert TLSSelfSigned(harness.charm).prepare(_certs_container({})) is True
+    stored = harness.charm.model.get_secret(label=SECRET_LABEL).get_content()
+    harness.cleanup()
+    cert = x509.load_pem_x509_certificate(stored["cert"].encode())
+    assert f"volcano-admission.{'m' * 63}.svc" in stored["sans"]
+    assert cert.subject.rfc4514_string() == "CN=volcano-admission"
+
+
+def test_self_signed_prepare_invalid_key_type(harness):
+    harness.update_config({"self-signed-key-type": "dsa"})
+    with pytest.raises(ConfigError, match="self-signed-key-type must be one of rsa, ecdsa"):
+        TLSSelfSigned(harness.charm).prepare(_certs_container({}))
+
+
+def test_self_signed_prepare_stored(harness):
+    _stored_certs(harness)
+    mock_container = _certs_container(dict.fromkeys(GENERATED, "old"))
+    with mock.patch.object(TLSSelfSigned, "_generate") as generate:
+        assert TLSSelfSigned(harness.charm).prepare(mock_container) is True
+    generate.assert_not_called()
+    assert mock_container.push.call_count == 3
+
+
+def test_self_signed_prepare_existing(harness):
+    _stored_certs(harness)
+    mock_container = _certs_container(GENERATED)
+    with mock.patch.object(TLSSelfSigned, "_generate") as generate:
+        assert TLSSelfSigned(harness.charm).prepare(mock_container) is False
+    generate.assert_not_called()
+    mock_container.push.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"sans": "old-name"},
+        {"key-type": "ecdsa"},
+        {"expiry": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()},
+    ],
+)
+def test_self_signed_prepare_regenerates(harness, overrides):
+    _stored_certs(harness, **overrides)
+    mock_container = _certs_container(GENERATED)
+    assert TLSSelfSigned(harness.charm).prepare(mock_container) is True
+    stored = harness.charm.model.get_secret(label=SECRET_LABEL).get_content(refresh=True)
+    assert stored["ca-cert"].startswith("-----BEGIN CERTIFICATE-----")
+    assert stored["key-type"] == "rsa"
+
+
+def test_self_signed_prepare_waits_for_leader(harness):
+    harness.set_leader(False)
+    mock_container = _certs_container({})
+    with pytest.raises(CertificateError):
+        TLSSelfSigned(harness.charm).prepare(mock_container)
+    mock_container.push.assert_not_called()
+
+
+def test_self_signed_prepare_waits_for_leader_to_replace(harness):
+    TLSSelfSigned(harness.charm).prepare(_certs_container({}))
+    harness.set_leader(False)
+    harness.update_config({"self-signed-key-type": "ecdsa"})
+    mock_container = _certs_container({})
+    with pytest.raises(CertificateError):
+        TLSSelfSigned(harness.charm).prepare(mock_container)
+    mock_container.push.assert_not_called()
 
 
 def test_relation_available(harness):
@@ -55,4 +172,23 @@ def test_relation_prepare(harness):
     charm = harness.charm
     relation = TLSRelation(charm, mock_cert_relation)
 
-    relation.prepare(mock_container)
+    assert relation.prepare(mock_container) is True
+    assert mock_container.push.call_count == 3
+
+
+def test_relation_prepare_unchanged(harness):
+    mock_container = mock.MagicMock()
+    mock_cert_relation = mock.MagicMock()
+    cert = mock_cert_relation.server_certs_map.__getitem__.return_value
+    contents = {
+        TLSRelation.CERTS / "ca.crt": mock_cert_relation.ca,
+        TLSRelation.CERTS / "server.crt": cert.cert,
+        TLSRelation.CERTS / "server.key": cert.key,
+    }
+    mock_container.pull.side_effect = lambda path: mock.MagicMock(
+        **{"read.return_value": contents[path]}
+    )
+    relation = TLSRelation(harness.charm, mock_cert_relation)
+
+    assert relation.prepare(mock_container) is False
+    mock_container.push.assert_not_called()
@@ -3,10 +3,18 @@
 import unittest.mock as mock
 
 import pytest
+import yaml
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.admissionregistration_v1 import MutatingWebhookConfiguration
+from ops.charm import PebbleReadyEvent
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.pebble import ConnectionError
+from ops.testing import ActionFailed
 
 from charm import CharmVolcano
+from tls_client import TLSSelfSigned
 
 
 def test_container_not_ready(harness):
@@ -59,6 +67,86 @@ def test_container_ready(mock_manifest, mock_admission, harness, conn_err):
         harness.charm.unit.status == MaintenanceStatus()
 
 
+@mock.patch("charm.Manifests")
+@mock.patch("admission.Admission.executable", return_value=True)
+def test_config_changed_reapplies(_executable, mock_manifest, harness):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    harness.update_config({"kube-api-qps": 500.0, "kube-api-burst": 1000})
+    mock_manifest.return_value.apply.assert_called_once_with()
+    plan = harness.get_container_pebble_plan(CharmVolcano.CONTAINER)
+    command = plan.services[CharmVolcano.CONTAINER].command
+    assert " --kube-api-qps=500 --kube-api-burst=1000" in command
+
+
+@pytest.fixture
+def reapplied(harness, lightkube_client):
+    """Run the install handler against the real manifests and sidecar."""
+    with mock.patch("manifests.KubernetesServicePatch"), mock.patch(
+        "admission.Admission.executable", return_value=True
+    ):
+        harness.set_can_connect(CharmVolcano.CONTAINER, True)
+        yield harness
+
+
+def _applied(lightkube_client, name):
+    (obj,) = [
+        c.args[0] for c in lightkube_client.apply.call_args_list if c.args[0].metadata.name == name
+    ]
+    return obj
+
+
+def test_config_changed_deletes_disabled_admission(reapplied, lightkube_client):
+    def live(kind, labels):
+        if kind is MutatingWebhookConfiguration:
+            return [kind(metadata=ObjectMeta(name="volcano-admission-service-pods-mutate"))]
+        return []
+
+    lightkube_client.list.side_effect = live
+    admissions = reapplied.charm.config["enabled-admissions"].split(",")
+    admissions.remove("/pods/mutate")
+    reapplied.update_config({"enabled-admissions": ",".join(admissions)})
+    lightkube_client.delete.assert_called_once_with(
+        MutatingWebhookConfiguration, "volcano-admission-service-pods-mutate", namespace=None
+    )
+    plan = reapplied.get_container_pebble_plan(CharmVolcano.CONTAINER)
+    assert "/pods/mutate" not in plan.services[CharmVolcano.CONTAINER].command
+
+
+def test_config_changed_applies_webhook_policies(reapplied, lightkube_client):
+    reapplied.update_config(
+        {"webhook-policies": "pods: {timeoutSeconds: 3, failurePolicy: Ignore}"}
+    )
+    webhook = _applied(lightkube_client, "volcano-admission-service-pods-mutate").webhooks[0]
+    assert (webhook.timeoutSeconds, webhook.failurePolicy) == (3, "Ignore")
+
+
+def test_config_changed_applies_pod_webhook_selectors(reapplied, lightkube_client):
+    reapplied.update_config({"pod-webhook-object-labels": "volcano.sh/job-name"})
+    webhook = _applied(lightkube_client, "volcano-admission-service-pods-validate").webhooks[0]
+    (expression,) = webhook.objectSelector.matchExpressions
+    assert (expression.key, expression.operator) == ("volcano.sh/job-name", "Exists")
+
+
+def test_config_changed_reissues_self_signed_certs(reapplied):
+    container = reapplied.model.unit.get_container(CharmVolcano.CONTAINER)
+    reapplied.update_config({"self-signed-key-type": "rsa"})
+    rsa_cert = container.pull(TLSSelfSigned.CERTS / "server.crt").read()
+    reapplied.update_config({"self-signed-key-type": "ecdsa"})
+    ecdsa_cert = container.pull(TLSSelfSigned.CERTS / "server.crt").read()
+    assert ecdsa_cert != rsa_cert
+    cert = x509.load_pem_x509_certificate(ecdsa_cert.encode())
+    assert isinstance(cert.public_key(), ec.EllipticCurvePublicKey)
+
+
+def test_self_signed_certs_wait_for_leader(reapplied):
+    reapplied.set_leader(False)
+    container = reapplied.model.unit.get_container(CharmVolcano.CONTAINER)
+    with mock.patch.object(PebbleReadyEvent, "defer") as defer:
+        reapplied.charm.on.volcano_pebble_ready.emit(container)
+    defer.assert_called_once_with()
+    assert reapplied.charm.unit.status == WaitingStatus("Server certificates not yet ready.")
+
+
 @mock.patch("charm.Admission")
 def test_leader_set(mock_admission, harness):
     # Get the plan now we've run PebbleReady
@@ -74,3 +162,24 @@ def test_update_status_ready(harness):
     harness.set_can_connect(CharmVolcano.CONTAINER, True)
     harness.charm.on.update_status.emit()
     assert harness.charm.unit.status == ActiveStatus()
+
+
+@mock.patch("charm.Manifests")
+def test_diff_manifests_action(mock_manifest, harness):
+    mock_manifest.return_value.diff.return_value = {"Kind(name)": ["spec.field"]}
+    output = harness.run_action("diff-manifests")
+    assert output.results == {"changed": 1, "diff": "Kind(name):\n- spec.field\n"}
+
+
+@mock.patch("manifests.KubernetesServicePatch")
+def test_diff_manifests_action_invalid_config(_ksp, harness):
+    harness.update_config({"webhook-policies": "pods: {timeoutSeconds: 0}"})
+    with pytest.raises(ActionFailed, match="pods.timeoutSeconds must be between 1 and 30"):
+        harness.run_action("diff-manifests")
+
+
+def test_config_changed_records_timings(reapplied, manifest_timings):
+    reapplied.update_config({"manifest-timings": True})
+    output = reapplied.run_action("manifest-timings")
+    operations = {t["operation"] for t in yaml.safe_load(output.results["timings"])}
+    assert {"render", "parse", "apply", "patch"} <= operations
@@ -0,0 +1,236 @@
+# Copyright 2023 Adam Dyess
+# See LICENSE file for licensing details.
+
+"""# Volcano Manifest Utilities Library.
+
+Helpers shared by the Volcano charms for applying, diffing and deleting the
+manifests each charm manages, and for timing those operations.
+
+This library is owned by the volcano-scheduler charm. The volcano-admission and
+volcano-controllers charms vendor an unchanged copy under
+`lib/charms/volcano/v0/`, and its tests live with the scheduler charm.
+
+Time each request to the API server with `Timings`, and answer the charm's
+`manifest-timings` action with `ManifestTimings`:
+
+```python
+from charms.volcano.v0.manifest_utils import ManifestTimings, Timings
+
+class SomeCharm(CharmBase):
+    def __init__(self, *args):
+        # ...
+        self.manifest_timings = ManifestTimings(self)
+
+    def _apply(self):
+        timings = Timings.load(self)
+        try:
+            with timings.measure("apply", "Kind", "name"):
+                ...
+        finally:
+            timings.save()
+```
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import yaml
+from lightkube import Client
+from lightkube.core.exceptions import ApiError
+from lightkube.core.selector import build_selector
+from ops.charm import ActionEvent, CharmBase
+from ops.framework import Object
+
+log = logging.getLogger(__name__)
+
+# The unique Charmhub library identifier, never change it
+LIBID = "be90a10b7bdb47b8a98b6539842d4041"
+
+# Increment this major API version when introducing breaking changes
+LIBAPI = 0
+
+# Increment this PATCH version before using `charmcraft publish-lib` or reset
+# to 0 if you are raising the major API version
+LIBPATCH = 2
+
+MAX_WORKERS = 4  # concurrent requests to the API server while applying
+TIMINGS_FILE = Path(".manifest-timings.json")  # relative to the charm dir
+SERVER_MANAGED = ("creationTimestamp", "generation", "managedFields", "resourceVersion", "uid")
+
+
+class ManifestError(Exception):
+    """Raised when one or more objects could not be applied."""
+
+    def __init__(self, errors: Mapping[str, Exception]):
+        self.errors = errors
+        details = "; ".join(f"{name}: {err}" for name, err in errors.items())
+        super().__init__(f"Failed to apply {len(errors)} object(s): {details}")
+
+
+class Timings:
+    """Record how long each manifest operation takes, attributed to an object."""
+
+    def __init__(self, path: Path, enabled: bool):
+        self.path = path
+        self.enabled = enabled
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, charm: CharmBase) -> "Timings":
+        """Record into the charm's timings file, when the manifest-timings config is set."""
+        return cls(
+            Path(charm.charm_dir, TIMINGS_FILE), charm.config.get("manifest-timings", False)
+        )
+
+    @contextmanager
+    def measure(self, operation: str, kind: str, name: str):
+        """Time the body of the with block, when enabled."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = round(time.perf_counter() - start, 4)
+            log.info(f"Timing operation={operation} kind={kind} name={name} seconds={seconds}")
+            with self._lock:
+                self.records.append(
+                    dict(operation=operation, kind=kind, name=name, seconds=seconds)
+                )
+
+    def timed(self, operation: str, kind: str, name: str, func: Callable[[], Any]):
+        """Wrap a task so it's timed when run."""
+
+        def _timed():
+            with self.measure(operation, kind, name):
+                return func()
+
+        return _timed
+
+    def save(self):
+        """Store this hook's timings for the manifest-timings action."""
+        if not self.enabled:
+            return
+        try:
+            tmp_file = self.path.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(self.records))
+            tmp_file.replace(self.path)
+        except OSError as e:
+            log.warning(f"Failed to write manifest timings {self.path}: {e}")
+
+
+def read_timings(charm_dir: Path) -> Optional[List[dict]]:
+    """Read the timings stored by the last hook which applied or deleted manifests."""
+    path = Path(charm_dir, TIMINGS_FILE)
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+class ManifestTimings(Object):
+    """Report the manifest timings recorded by the last hook through the charm's action."""
+
+    def __init__(self, charm: CharmBase):
+        super().__init__(charm, "manifest-timings")
+        self._charm = charm
+        self.framework.observe(charm.on.manifest_timings_action, self._on_manifest_timings)
+
+    def _on_manifest_timings(self, event: ActionEvent):
+        timings = read_timings(self._charm.charm_dir)
+        if timings is None:
+            event.fail("No manifest timings recorded, enable the manifest-timings config")
+            return
+        timings = sorted(timings, key=lambda t: t["seconds"], reverse=True)
+        event.set_results(
+            {
+                "total-seconds": f"{sum(t['seconds'] for t in timings):.4f}",
+                "timings": yaml.safe_dump(timings, sort_keys=False),
+            }
+        )
+
+
+def run_concurrently(tasks: Mapping[str, Callable[[], Any]]):
+    """Run each task on a bounded thread pool, raising all failures together."""
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {name: pool.submit(task) for name, task in tasks.items()}
+    errors = {name: f.exception() for name, f in futures.items() if f.exception()}
+    for name, err in errors.items():
+        log.error(f"Failed to apply {name}: {err}")
+    if errors:
+        raise ManifestError(errors)
+
+
+def comparable(obj: dict) -> dict:
+    """Drop the fields of an object which the API server manages."""
+    obj = {k: v for k, v in obj.items() if k != "status"}
+    metadata = obj.get("metadata") or {}
+    obj["metadata"] = {k: v for k, v in metadata.items() if k not in SERVER_MANAGED}
+    return obj
+
+
+def diff_fields(live: Any, desired: Any, path: str = "") -> List[str]:
+    """List the path of every field which differs between two objects."""
+    if isinstance(live, dict) and isinstance(desired, dict):
+        return [
+            field
+            for key in sorted(set(live) | set(desired))
+            for field in diff_fields(live.get(key), desired.get(key), f"{path}.{key}".lstrip("."))
+        ]
+    if isinstance(live, list) and isinstance(desired, list) and len(live) == len(desired):
+        return [
+            field
+            for idx, (a, b) in enumerate(zip(live, desired))
+            for field in diff_fields(a, b, f"{path}[{idx}]")
+        ]
+    return [] if live == desired else [path]
+
+
+def _request_deletecollection(client: Client, kind, selector: str):
+    """Send a deletecollection request with a label selector.
+
+    Client.deletecollection doesn't accept a label selector, so this goes through
+    lightkube's private generic client, the only use of its internals.
+    """
+    client._client.request("deletecollection", res=kind, params={"labelSelector": selector})
+
+
+def delete_collection(
+    client: Client,
+    kind,
+    labels: Dict[str, str],
+    timings: Timings,
+    ignore_unauthorized: bool = False,
+) -> bool:
+    """Delete every object of a kind with the given labels.
+
+    Returns False when the collection can't be deleted, so the caller can fall back
+    to deleting each rendered object. That includes a lightkube release whose
+    internals no longer accept the request.
+    """
+    selector = build_selector(labels)
+    rtype = kind._api_info.resource.kind
+    try:
+        with timings.measure("delete", rtype, selector):
+            _request_deletecollection(client, kind, selector)
+    except (AttributeError, TypeError) as err:
+        log.warning(f"Cannot delete {rtype} collection ({selector}) with this lightkube: {err}")
+        return False
+    except ApiError as err:
+        message = err.status.message or ""
+        if "(unauthorized)" in message.lower() and ignore_unauthorized:
+            # Ignore error from https://bugs.launchpad.net/juju/+bug/1941655
+            log.warning(f"Ignoring unauthorized error: {message}")
+            return True
+        log.warning(f"Cannot delete {rtype} collection ({selector}): {message}")
+        return False
+    log.info(f"Deleted {rtype} collection ({selector})")
+    return True
@@ -14,6 +14,7 @@ develop a new k8s charm using the Operator Framework:
 
 import logging
 
+from charms.volcano.v0.manifest_utils import ManifestTimings
 from ops.charm import CharmBase
 from ops.main import main
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
@@ -36,11 +37,13 @@ class CharmVolcano(CharmBase):
 
     def __init__(self, *args):
         super().__init__(*args)
+        self.framework.observe(self.on.config_changed, self._install_or_upgrade)
         self.framework.observe(self.on.upgrade_charm, self._install_or_upgrade)
         self.framework.observe(self.on.volcano_pebble_ready, self._install_or_upgrade)
         self.framework.observe(self.on.update_status, self._update_status)
         self.framework.observe(self.on.leader_elected, self._set_version)
         self.framework.observe(self.on.stop, self._cleanup)
+        self.manifest_timings = ManifestTimings(self)
 
     def _update_status(self, _event):
         container = self.model.unit.get_container(self.CONTAINER)
@@ -1,11 +1,22 @@
 """Digest charm configuration from application and relations."""
 from dataclasses import dataclass, field
+from typing import Tuple
 
 
 class ConfigError(Exception):
     """Raised when charm has a configuration error."""
 
 
+def _kube_api_limits(charm) -> Tuple[float, int]:
+    """Load the client-side rate limits for the workload's Kubernetes API client."""
+    qps, burst = charm.config["kube-api-qps"], charm.config["kube-api-burst"]
+    if qps <= 0:
+        raise ConfigError("kube-api-qps must be greater than 0")
+    if burst < 1:
+        raise ConfigError("kube-api-burst must be at least 1")
+    return qps, burst
+
+
 @dataclass
 class ControllerArgs:
     """Model command line arguments for the controller."""
@@ -13,8 +24,11 @@ class ControllerArgs:
     enable_healthz: str = "true"
     loglevel: int = 4
     extra_args: dict = field(default_factory=dict)
+    kube_api_qps: float = 50.0
+    kube_api_burst: int = 100
 
     @classmethod
     def load(cls, charm) -> "ControllerArgs":
         """Load controller args from charm config and relations."""
-        return cls()
+        kube_api_qps, kube_api_burst = _kube_api_limits(charm)
+        return cls(kube_api_qps=kube_api_qps, kube_api_burst=kube_api_burst)
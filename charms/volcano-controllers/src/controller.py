@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from pathlib import Path
 
 from ops.model import Container
-from ops.pebble import ExecError
+from ops.pebble import ExecError, Service
 
 from config import ControllerArgs
 
@@ -22,6 +22,7 @@ class Controller:
         logredirect = "--logtostderr"
         healthz = f"--enable-healthz={args.enable_healthz}"
         loglevel = f"-v={args.loglevel}"
+        kube_api = f"--kube-api-qps={args.kube_api_qps:g} --kube-api-burst={args.kube_api_burst}"
 
         extra_args = args.extra_args
         extra = ""
@@ -30,7 +31,7 @@ class Controller:
                 sorted(f"--{key}='{value}'" for key, value in extra_args.items())
             )
 
-        self.command = f"{self.binary} {logredirect} {healthz} {loglevel}{extra} 2>&1"
+        self.command = f"{self.binary} {logredirect} {healthz} {loglevel} {kube_api}{extra} 2>&1"
         return self
 
     def apply(self, charm, args):
@@ -39,11 +40,25 @@ class Controller:
         return self
 
     def restart(self, container):
-        """Update pebble layer for container."""
+        """Update pebble layer for container, restarting only when the layer changed."""
+        service_changed = self._service_changed(container)
         container.add_layer(container.name, self._layer, combine=True)
+        if not service_changed and self._running(container):
+            logger.info("Controller service is unchanged, skipping restart")
+            return
         container.autostart()
         container.restart(container.name)
 
+    def _service_changed(self, container: Container) -> bool:
+        current = container.get_plan().services.get(container.name)
+        desired = Service(container.name, self._layer["services"]["volcano"])
+        return current is None or current.to_dict() != desired.to_dict()
+
+    @staticmethod
+    def _running(container: Container) -> bool:
+        service = container.get_services(container.name).get(container.name)
+        return bool(service and service.is_running())
+
     def executable(self, container) -> bool:
         """Check if container has the appropriate executable."""
         path, file = self.binary.parent, self.binary.name
@@ -3,6 +3,7 @@
 import logging
 from typing import List, Sequence
 
+from charms.volcano.v0.manifest_utils import Timings
 from lightkube import Client
 from lightkube.resources.apps_v1 import StatefulSet
 
@@ -17,6 +18,7 @@ class Manifests:
         self.namespace = charm.model.name
         self.application = charm.app.name
         self.client = Client(namespace=self.namespace, field_manager=self.application)
+        self.timings = Timings.load(charm)
 
     @property
     def _patches(self) -> Sequence[dict]:
@@ -39,5 +41,9 @@ class Manifests:
 
     def apply(self):
         """Apply all manifests managed by this charm."""
-        for patch in self._sorted_patches:
-            self.client.patch(**patch)
+        try:
+            for patch in self._sorted_patches:
+                with self.timings.measure("patch", patch["res"].__name__, patch["name"]):
+                    self.client.patch(**patch)
+        finally:
+            self.timings.save()
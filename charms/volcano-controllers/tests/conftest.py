@@ -15,6 +15,14 @@ def lightkube_client():
         yield client
 
 
+@pytest.fixture(autouse=True)
+def manifest_timings(tmp_path):
+    # Keep the recorded manifest timings out of the charm directory
+    timings_file = tmp_path / "manifest-timings.json"
+    with patch("charms.volcano.v0.manifest_utils.TIMINGS_FILE", timings_file):
+        yield timings_file
+
+
 @pytest.fixture(scope="function")
 def harness(request):
     """Test setup."""
@@ -4,6 +4,7 @@ import pytest
 from ops.pebble import ExecError
 
 from charm import CharmVolcano
+from config import ConfigError
 from controller import Controller, ControllerArgs
 
 
@@ -20,7 +21,7 @@ def test_command(harness, controller):
     args = ControllerArgs("false", 1, {"extra": "args"})
 
     controller.apply(harness.charm, args)
-    cmd = "/vc-controller-manager --logtostderr --enable-healthz=false -v=1 --extra='args' 2>&1"
+    cmd = "/vc-controller-manager --logtostderr --enable-healthz=false -v=1 --kube-api-qps=50 --kube-api-burst=100 --extra='args' 2>&1"
     assert controller.command == cmd
 
 
@@ -46,6 +47,37 @@ def test_restart(harness, controller):
     assert expected_plan == updated_plan
 
 
+@pytest.fixture
+def running(harness, controller):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    container = harness.model.unit.get_container(CharmVolcano.CONTAINER)
+    controller.command = "mock_command"
+    controller.restart(container)
+    assert container.get_service("volcano").is_running()
+    with mock.patch.object(container, "restart") as mock_restart:
+        yield container, mock_restart
+
+
+def test_restart_unchanged(running, controller):
+    container, mock_restart = running
+    controller.restart(container)
+    mock_restart.assert_not_called()
+
+
+def test_restart_command_changed(running, controller):
+    container, mock_restart = running
+    controller.command = "new_command"
+    controller.restart(container)
+    mock_restart.assert_called_once_with("volcano")
+
+
+def test_restart_stopped(running, controller):
+    container, mock_restart = running
+    container.stop("volcano")
+    controller.restart(container)
+    mock_restart.assert_called_once_with("volcano")
+
+
 def test_version_success(harness, controller):
     exec_response = """\
 API Version: v1alpha1
@@ -87,3 +119,23 @@ def test_version_failure(harness, controller, failure):
             mock_process.wait_output.return_value = (exec_response, None)
             version = controller.version(container)
     assert version == "Unknown"
+
+
+def test_command_kube_api_limits(harness, controller):
+    harness.update_config({"kube-api-qps": 500.5, "kube-api-burst": 1000})
+    args = ControllerArgs.load(harness.charm)
+    controller.apply(harness.charm, args)
+    assert " --kube-api-qps=500.5 --kube-api-burst=1000 " in controller.command
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        ({"kube-api-qps": 0.0}, "kube-api-qps must be greater than 0"),
+        ({"kube-api-burst": 0}, "kube-api-burst must be at least 1"),
+    ],
+)
+def test_kube_api_limits_invalid(harness, config, message):
+    harness.update_config(config)
+    with pytest.raises(ConfigError, match=message):
+        ControllerArgs.load(harness.charm)
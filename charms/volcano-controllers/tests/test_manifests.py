@@ -1,4 +1,9 @@
+import logging
+import unittest.mock as mock
+
 import pytest
+from charms.volcano.v0.manifest_utils import read_timings
+from lightkube.core.exceptions import ApiError
 from lightkube.resources.apps_v1 import StatefulSet
 
 from manifests import Manifests
@@ -38,3 +43,27 @@ def test_apply(lightkube_client, manifests):
         manifests.namespace,
         {"spec": {"template": {"spec": {"priorityClassName": "system-cluster-critical"}}}},
     )
+
+
+def test_apply_raises_api_error(lightkube_client, manifests):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Patch Failure")
+    lightkube_client.patch.side_effect = ApiError(response=mock_response)
+    with pytest.raises(ApiError):
+        manifests.apply()
+
+
+def test_apply_records_timings(lightkube_client, harness, manifest_timings, caplog):
+    caplog.set_level(logging.INFO)
+    harness.update_config({"manifest-timings": True})
+    Manifests(harness.charm).apply()
+    (record,) = read_timings(harness.charm.charm_dir)
+    assert record["operation"] == "patch"
+    assert (record["kind"], record["name"]) == ("StatefulSet", harness.charm.app.name)
+    assert f"Timing operation=patch kind=StatefulSet name={harness.charm.app.name}" in caplog.text
+
+
+def test_timings_disabled(lightkube_client, manifests, manifest_timings):
+    manifests.apply()
+    assert manifests.timings.records == []
+    assert not manifest_timings.exists()
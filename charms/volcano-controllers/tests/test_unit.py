@@ -59,6 +59,17 @@ def test_container_ready(mock_manifest, mock_controller, harness, conn_err):
         harness.charm.unit.status == MaintenanceStatus()
 
 
+@mock.patch("charm.Manifests")
+@mock.patch("controller.Controller.executable", return_value=True)
+def test_config_changed_reapplies(_executable, mock_manifest, harness):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    harness.update_config({"kube-api-qps": 500.0, "kube-api-burst": 1000})
+    mock_manifest.return_value.apply.assert_called_once_with()
+    plan = harness.get_container_pebble_plan(CharmVolcano.CONTAINER)
+    command = plan.services[CharmVolcano.CONTAINER].command
+    assert " --kube-api-qps=500 --kube-api-burst=1000" in command
+
+
 @mock.patch("charm.Controller")
 def test_leader_set(mock_controller, harness):
     # Get the plan now we've run PebbleReady
@@ -74,3 +85,11 @@ def test_update_status_ready(harness):
     harness.set_can_connect(CharmVolcano.CONTAINER, True)
     harness.charm.on.update_status.emit()
     assert harness.charm.unit.status == ActiveStatus()
+
+
+@mock.patch("controller.Controller.executable", return_value=True)
+def test_config_changed_records_timings(_executable, harness, manifest_timings):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    harness.update_config({"manifest-timings": True})
+    output = harness.run_action("manifest-timings")
+    assert output.results["timings"].startswith("- operation: patch\n  kind: StatefulSet")
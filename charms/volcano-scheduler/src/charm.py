@@ -14,15 +14,18 @@ develop a new k8s charm using the Operator Framework:
 
 import logging
 
+import yaml
 from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
 from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
+from charms.volcano.v0.manifest_utils import ManifestTimings
+from lightkube.core.exceptions import ApiError
 from ops.charm import CharmBase
 from ops.main import main
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.pebble import ConnectionError
 
-from config import ConfigError, SchedulerArgs, SchedulerConfig
-from manifests import Manifests
+from config import ConfigError, SchedulerArgs, SchedulerConfig, load_queues
+from manifests import CRDsNotEstablishedError, Manifests
 from prometheus import Prometheus
 from scheduler import Scheduler
 
@@ -45,8 +48,13 @@ class CharmVolcano(CharmBase):
         self.framework.observe(self.on.update_status, self._update_status)
         self.framework.observe(self.on.leader_elected, self._set_version)
         self.framework.observe(self.on.stop, self._cleanup)
+        self.framework.observe(self.on.diff_manifests_action, self._diff_manifests)
+        self.manifest_timings = ManifestTimings(self)
 
-        self.prometheus = Prometheus(self.model.config["kube-state-metrics-namespace"])
+        self.prometheus = Prometheus(
+            self.model.config["kube-state-metrics-namespace"],
+            self.model.config["enable-metrics"],
+        )
 
         self.grafana_dashboards_provider = GrafanaDashboardProvider(self)
         self.metrics_endpoint = MetricsEndpointProvider(self, jobs=self.prometheus.scrape_jobs)
@@ -55,15 +63,30 @@ class CharmVolcano(CharmBase):
         container = self.model.unit.get_container(self.CONTAINER)
         if not container or not container.can_connect():
             self.unit.status = WaitingStatus("Scheduler Not Ready")
+        elif self.model.config.get("leader-elect", True):
+            self.unit.status = ActiveStatus(self._lease_status())
         else:
             self.unit.status = ActiveStatus()
 
+    def _lease_status(self) -> str:
+        try:
+            holder = Manifests(self).lease_holder()
+        except ApiError as e:
+            logger.warning(f"Cannot read the scheduler lease: {e.status.message}")
+            return ""
+        if holder is None:
+            return "Electing a leader"
+        if holder == self.unit.name:
+            return "Leading"
+        return f"Standby, lease held by {holder}"
+
     def _install_or_upgrade(self, event):
         scheduler = Scheduler()
 
         try:
             app_args = SchedulerArgs.load(self)
             app_config = SchedulerConfig.load(self)
+            load_queues(self)  # validated here, applied by the manifests
             scheduler.apply(self, app_config, app_args)
         except ConfigError as e:
             self.unit.status = BlockedStatus(str(e))
@@ -78,9 +101,10 @@ class CharmVolcano(CharmBase):
             self.unit.status = BlockedStatus(f"Image missing executable: {scheduler.binary}")
             return
 
-        manifests = Manifests(self)
-        if self.unit.is_leader():
-            manifests.apply()
+        if not self._apply_manifests(Manifests(self)):
+            self.unit.status = WaitingStatus("Waiting for Volcano CRDs to be established")
+            event.defer()
+            return
 
         try:
             scheduler.restart(container)
@@ -91,11 +115,28 @@ class CharmVolcano(CharmBase):
 
         self.unit.status = MaintenanceStatus("Waiting for scheduler to start")
 
-    def _on_config_changed(self, _event):
+    def _apply_manifests(self, manifests: Manifests) -> bool:
+        """Apply the manifests as the leader, returning whether the CRDs are established."""
+        try:
+            if self.unit.is_leader():
+                manifests.apply()
+        except CRDsNotEstablishedError:
+            # the queues wait on the CRDs too, and are applied on the deferred event
+            return False
+        # Don't start the scheduler's informers before the CRDs are served
+        return manifests.wait_for_established()
+
+    def _on_config_changed(self, event):
         metrics_namespace = self.model.config["kube-state-metrics-namespace"]
-        if metrics_namespace != self.prometheus.namespace:
+        scheduler_metrics = self.model.config["enable-metrics"]
+        if (metrics_namespace, scheduler_metrics) != (
+            self.prometheus.namespace,
+            self.prometheus.scheduler_metrics,
+        ):
             self.prometheus.namespace = metrics_namespace
+            self.prometheus.scheduler_metrics = scheduler_metrics
             self.metrics_endpoint.update_scrape_job_spec(self.prometheus.scrape_jobs)
+        self._install_or_upgrade(event)
 
     def _set_version(self, _event=None):
         if not self.unit.is_leader():
@@ -108,6 +149,17 @@ class CharmVolcano(CharmBase):
         version = Scheduler().version(container)
         self.unit.set_workload_version(version)
 
+    def _diff_manifests(self, event):
+        try:
+            changes = Manifests(self).diff()
+        except ConfigError as e:
+            event.fail(str(e))
+            return
+        except ApiError as e:
+            event.fail(f"Failed to diff manifests: {e.status.message}")
+            return
+        event.set_results({"changed": len(changes), "diff": yaml.safe_dump(changes)})
+
     def _cleanup(self, _):
         cont = self.model.unit.get_container(self.CONTAINER)
         if cont and cont.can_connect() and cont.get_services(cont.name):
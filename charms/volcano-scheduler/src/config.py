@@ -1,24 +1,228 @@
 """Digest charm configuration from application and relations."""
+import re
 from dataclasses import asdict, dataclass, field
-from typing import Any, List, Mapping, TypedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple, TypedDict, Union
+
+import yaml
+
+ACTIONS = ("enqueue", "allocate", "preempt", "reclaim", "backfill", "shuffle")
+PLUGINS = (
+    "binpack",
+    "capacity",
+    "cdp",
+    "conformance",
+    "deviceshare",
+    "drf",
+    "extender",
+    "gang",
+    "nodegroup",
+    "nodeorder",
+    "numaaware",
+    "overcommit",
+    "pdb",
+    "predicates",
+    "priority",
+    "proportion",
+    "rescheduling",
+    "resourcequota",
+    "sla",
+    "task-topology",
+    "tdm",
+    "usage",
+)
+# typed arguments of the plugins with performance relevant settings,
+# a key ending with "." applies to every argument with that prefix
+PLUGIN_ARGUMENTS: Mapping[str, Mapping[str, type]] = {
+    "binpack": {
+        "binpack.weight": int,
+        "binpack.cpu": int,
+        "binpack.memory": int,
+        "binpack.resources": str,
+        "binpack.resources.": int,
+    },
+    "nodeorder": {
+        "nodeaffinity.weight": int,
+        "podaffinity.weight": int,
+        "leastrequested.weight": int,
+        "mostrequested.weight": int,
+        "balancedresource.weight": int,
+        "tainttoleration.weight": int,
+        "imagelocality.weight": int,
+    },
+    "overcommit": {"overcommit-factor": float},
+    "predicates": {
+        "predicate.CacheEnable": bool,
+        "predicate.GPUSharingEnable": bool,
+        "predicate.ProportionalEnable": bool,
+    },
+}
+PluginArguments = Dict[str, Union[bool, int, float, str]]
+DURATION = re.compile(r"^(\d+(\.\d+)?(ns|us|µs|ms|s|m|h))+$")  # a Go time.Duration
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)")
+DNS_SUBDOMAIN = re.compile(r"^[a-z0-9]([-a-z0-9.]{0,251}[a-z0-9])?$")
+LABEL_KEY = re.compile(
+    r"^([a-z0-9]([-a-z0-9.]{0,251}[a-z0-9])?/)?[A-Za-z0-9]([-A-Za-z0-9_.]{0,61}[A-Za-z0-9])?$"
+)
+LABEL_VALUE = re.compile(r"^([A-Za-z0-9]([-A-Za-z0-9_.]{0,61}[A-Za-z0-9])?)?$")
+VOLCANO_QUEUES = ("default", "root")  # created and managed by Volcano itself
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600}
 
 
 class ConfigError(Exception):
     """Raised when charm has a configuration error."""
 
 
-class SchedulerPlugin(TypedDict):
-    """Model config for the Scheduler plugin."""
+def load_queues(charm) -> List[str]:
+    """Load the names of the Volcano queues this scheduler shard creates."""
+    queues = [name.strip() for name in charm.config["queues"].split(",") if name.strip()]
+    for name in queues:
+        if not DNS_SUBDOMAIN.match(name):
+            raise ConfigError(f"queues: {name!r} isn't a valid queue name")
+        if name in VOLCANO_QUEUES:
+            raise ConfigError(f"queues: {name!r} is managed by Volcano")
+    return sorted(set(queues))
+
+
+def _node_selector(charm) -> List[Tuple[str, str]]:
+    """Load the node labels in config order; vc-scheduler caches nodes matching any."""
+    selector: List[Tuple[str, str]] = []
+    for term in charm.config["node-selector"].replace(",", " ").split():
+        key, sep, value = term.partition("=")
+        if not sep or not LABEL_KEY.match(key) or not LABEL_VALUE.match(value):
+            raise ConfigError(f"node-selector: {term!r} isn't a valid key=value label")
+        if (key, value) in selector:
+            raise ConfigError(f"node-selector: {term!r} is repeated")
+        selector.append((key, value))
+    return selector
+
+
+def _kube_api_limits(charm) -> Tuple[float, int]:
+    """Load the client-side rate limits for the workload's Kubernetes API client."""
+    qps, burst = charm.config["kube-api-qps"], charm.config["kube-api-burst"]
+    if qps <= 0:
+        raise ConfigError("kube-api-qps must be greater than 0")
+    if burst < 1:
+        raise ConfigError("kube-api-burst must be at least 1")
+    return qps, burst
+
 
+class _SchedulerPluginName(TypedDict):
     name: str
 
 
+class SchedulerPlugin(_SchedulerPluginName, total=False):
+    """Model config for the Scheduler plugin.
+
+    Each enable flag turns one of the plugin's extension points on or off, the
+    scheduler's default applies when a flag isn't set.
+    """
+
+    enableJobOrder: bool  # noqa: N815
+    enableHierarchy: bool  # noqa: N815
+    enableJobReady: bool  # noqa: N815
+    enableJobPipelined: bool  # noqa: N815
+    enableTaskOrder: bool  # noqa: N815
+    enablePreemptable: bool  # noqa: N815
+    enableReclaimable: bool  # noqa: N815
+    enablePreemptive: bool  # noqa: N815
+    enableQueueOrder: bool  # noqa: N815
+    EnabledClusterOrder: bool  # noqa: N815
+    enablePredicate: bool  # noqa: N815
+    enableBestNode: bool  # noqa: N815
+    enableNodeOrder: bool  # noqa: N815
+    enableTargetJob: bool  # noqa: N815
+    enableReservedNodes: bool  # noqa: N815
+    enableJobEnqueued: bool  # noqa: N815
+    enabledVictim: bool  # noqa: N815
+    enableJobStarving: bool  # noqa: N815
+    enabledOverused: bool  # noqa: N815
+    enabledAllocatable: bool  # noqa: N815
+    arguments: PluginArguments
+
+
+# spelled as the scheduler reads them, which isn't always consistent
+ENABLE_FLAGS = tuple(key for key in SchedulerPlugin.__optional_keys__ if key != "arguments")
+
+
 class SchedulerPlugins(TypedDict):
     """Model config for the Scheduler plugin list."""
 
     plugins: List[SchedulerPlugin]
 
 
+def _duration(charm, key: str) -> float:
+    """Load a positive Go duration from charm config, in seconds."""
+    value = charm.config[key]
+    seconds = DURATION.match(value) and sum(
+        float(number) * DURATION_UNITS[unit] for number, unit in DURATION_PART.findall(value)
+    )
+    if not seconds:
+        raise ConfigError(f"{key} {value!r} isn't a positive duration")
+    return seconds
+
+
+def _invalid(path: str, reason: str) -> ConfigError:
+    return ConfigError(f"Invalid scheduler-config {path}: {reason}")
+
+
+def _validate_actions(actions: Any) -> List[str]:
+    if not isinstance(actions, str) or not actions.strip():
+        raise _invalid("actions", "expected a comma separated string")
+    names = [action.strip() for action in actions.split(",")]
+    for name in names:
+        if name not in ACTIONS:
+            raise _invalid("actions", f"unknown action {name!r}")
+    return names
+
+
+def _validate_plugin(path: str, plugin: Any):
+    if not isinstance(plugin, dict) or plugin.get("name") not in PLUGINS:
+        raise _invalid(path, "expected a known plugin name")
+    for key, value in plugin.items():
+        if key == "name":
+            continue
+        if key in ENABLE_FLAGS:
+            if not isinstance(value, bool):
+                raise _invalid(f"{path}.{key}", "expected a boolean")
+        elif key == "arguments":
+            _validate_arguments(f"{path}.{key}", plugin["name"], value)
+        else:
+            raise _invalid(path, f"unknown key {key!r}")
+
+
+def _argument_type(plugin: str, key: str) -> type:
+    known = PLUGIN_ARGUMENTS[plugin]
+    if key in known:
+        return known[key]
+    for prefix, kind in known.items():
+        if prefix.endswith(".") and key.startswith(prefix):
+            return kind
+    raise KeyError(key)
+
+
+def _validate_arguments(path: str, plugin: str, arguments: Any):
+    if not isinstance(arguments, dict):
+        raise _invalid(path, "expected a mapping")
+    for key, value in arguments.items():
+        if isinstance(value, (dict, list)) or value is None:
+            raise _invalid(f"{path}.{key}", "expected a scalar")
+        if plugin not in PLUGIN_ARGUMENTS:
+            continue
+        try:
+            kind = _argument_type(plugin, key)
+        except KeyError:
+            raise _invalid(path, f"unknown {plugin} argument {key!r}") from None
+        # bool is an int, and an int is an acceptable float
+        if kind is float:
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        elif kind is int:
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        else:
+            valid = isinstance(value, kind)
+        if not valid:
+            raise _invalid(f"{path}.{key}", f"expected {kind.__name__}")
+
+
 @dataclass
 class SchedulerConfig:
     """Model config for the Scheduler."""
@@ -29,7 +233,50 @@ class SchedulerConfig:
     @classmethod
     def load(cls, charm) -> "SchedulerConfig":
         """Load scheduler config from charm config and relations."""
-        return DEFAULT_CONFIG
+        profile = charm.config["scheduler-profile"]
+        custom = charm.config["scheduler-config"].strip()
+        if profile == "custom":
+            if not custom:
+                raise ConfigError("scheduler-profile=custom requires scheduler-config")
+            try:
+                data = yaml.safe_load(custom)
+            except yaml.YAMLError as e:
+                raise ConfigError(
+                    f"scheduler-config isn't valid YAML: {getattr(e, 'problem', e)}"
+                ) from e
+            return cls.from_dict(data)
+        if custom:
+            raise ConfigError("scheduler-config requires scheduler-profile=custom")
+        if profile not in PROFILES:
+            raise ConfigError(f"Unknown scheduler-profile {profile!r}")
+        return PROFILES[profile]
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "SchedulerConfig":
+        """Validate a scheduler config document and build the config."""
+        if not isinstance(data, dict):
+            raise _invalid("document", "expected a mapping with actions and tiers")
+        if unknown := sorted(set(data) - {"actions", "tiers"}):
+            raise _invalid("document", f"unknown keys {unknown}")
+        names = _validate_actions(data.get("actions"))
+
+        tiers = data.get("tiers")
+        if not isinstance(tiers, list) or not tiers:
+            raise _invalid("tiers", "expected a non-empty list")
+        for t_idx, tier in enumerate(tiers):
+            plugins = isinstance(tier, dict) and tier.get("plugins")
+            if not isinstance(plugins, list) or not plugins or set(tier) != {"plugins"}:
+                raise _invalid(f"tiers[{t_idx}]", "expected a non-empty plugins list")
+            for p_idx, plugin in enumerate(plugins):
+                _validate_plugin(f"tiers[{t_idx}].plugins[{p_idx}]", plugin)
+
+        return cls(
+            actions=", ".join(names),
+            tiers=[
+                SchedulerPlugins(plugins=[SchedulerPlugin(**p) for p in tier["plugins"]])
+                for tier in tiers
+            ],
+        )
 
     def asdict(self) -> Mapping[str, Any]:
         """Return config as a mapping."""
@@ -60,16 +307,117 @@ DEFAULT_CONFIG = SchedulerConfig(
 )
 
 
+# Trade off scheduling cost against placement quality
+PROFILES = {
+    "default": DEFAULT_CONFIG,
+    # Skip the costly fairness and scoring plugins to bind pods as fast as possible
+    "throughput": SchedulerConfig(
+        actions="enqueue, allocate, backfill",
+        tiers=[
+            SchedulerPlugins(
+                plugins=[
+                    SchedulerPlugin(name="priority"),
+                    SchedulerPlugin(name="gang", enablePreemptable=False),
+                    SchedulerPlugin(name="conformance"),
+                ]
+            ),
+            SchedulerPlugins(
+                plugins=[
+                    SchedulerPlugin(name="overcommit"),
+                    SchedulerPlugin(name="predicates", arguments={"predicate.CacheEnable": True}),
+                    SchedulerPlugin(name="proportion"),
+                    SchedulerPlugin(name="nodeorder"),
+                ]
+            ),
+        ],
+    ),
+    # Fill nodes before using new ones, leaving whole nodes free for large jobs
+    "dense-binpack": SchedulerConfig(
+        actions="enqueue, allocate, backfill",
+        tiers=[
+            SchedulerPlugins(
+                plugins=[
+                    SchedulerPlugin(name="priority"),
+                    SchedulerPlugin(name="gang", enablePreemptable=False),
+                    SchedulerPlugin(name="conformance"),
+                ]
+            ),
+            SchedulerPlugins(
+                plugins=[
+                    SchedulerPlugin(name="overcommit"),
+                    SchedulerPlugin(name="predicates"),
+                    SchedulerPlugin(name="proportion"),
+                    SchedulerPlugin(name="binpack", arguments={"binpack.weight": 10}),
+                ]
+            ),
+        ],
+    ),
+    # Share resources between queues and jobs, reclaiming and preempting to do so
+    "fair-share": SchedulerConfig(
+        actions="enqueue, allocate, preempt, reclaim, backfill",
+        tiers=[
+            SchedulerPlugins(
+                plugins=[
+                    SchedulerPlugin(name="priority"),
+                    SchedulerPlugin(name="gang"),
+                    SchedulerPlugin(name="conformance"),
+                ]
+            ),
+            SchedulerPlugins(
+                plugins=[
+                    SchedulerPlugin(name="overcommit"),
+                    SchedulerPlugin(name="drf"),
+                    SchedulerPlugin(name="predicates"),
+                    SchedulerPlugin(name="proportion"),
+                    SchedulerPlugin(name="nodeorder"),
+                ]
+            ),
+        ],
+    ),
+}
+
+
 @dataclass
 class SchedulerArgs:
     """Model command line arguments for the scheduler."""
 
     enable_healthz: str = "true"
-    enable_metrics: str = "false"
+    enable_metrics: str = "true"
     loglevel: int = 3
     extra_args: dict = field(default_factory=dict)
+    minimum_feasible_nodes: int = 100
+    percentage_nodes_to_find: int = 0
+    schedule_period: str = "1s"
+    kube_api_qps: float = 2000.0
+    kube_api_burst: int = 2000
+    leader_elect: Optional[bool] = None  # unset keeps vc-scheduler's default
+    scheduler_name: str = "volcano"
+    node_selector: List[Tuple[str, str]] = field(default_factory=list)
 
     @classmethod
     def load(cls, charm) -> "SchedulerArgs":
         """Load scheduler args from charm config and relations."""
-        return cls()
+        minimum_feasible_nodes = charm.config["minimum-feasible-nodes"]
+        if minimum_feasible_nodes < 1:
+            raise ConfigError("minimum-feasible-nodes must be at least 1")
+        percentage_nodes_to_find = charm.config["percentage-nodes-to-find"]
+        if not 0 <= percentage_nodes_to_find <= 100:
+            raise ConfigError("percentage-nodes-to-find must be between 0 and 100")
+        _duration(charm, "schedule-period")
+        kube_api_qps, kube_api_burst = _kube_api_limits(charm)
+
+        scheduler_name = charm.config["scheduler-name"]
+        if not DNS_SUBDOMAIN.match(scheduler_name):
+            raise ConfigError(f"scheduler-name {scheduler_name!r} isn't a valid name")
+
+        return cls(
+            enable_metrics=str(charm.config["enable-metrics"]).lower(),
+            minimum_feasible_nodes=minimum_feasible_nodes,
+            percentage_nodes_to_find=percentage_nodes_to_find,
+            schedule_period=charm.config["schedule-period"],
+            kube_api_qps=kube_api_qps,
+            kube_api_burst=kube_api_burst,
+            leader_elect=charm.config.get("leader-elect"),
+            scheduler_name=scheduler_name,
+            node_selector=_node_selector(charm),
+        )
@@ -0,0 +1,79 @@
+"""Precompile the Volcano CRD templates into a JSON bundle per CRD base.
+
+The YAML templates remain the source of truth. Each bundle records a hash of the
+templates it was built from, and is ignored at runtime when they no longer match.
+The bundles are committed next to the templates; regenerate them whenever the
+templates change:
+
+    python3 src/crd_bundle.py
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, List, Mapping, Optional
+
+import yaml
+
+log = logging.getLogger(__name__)
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+TEMPLATES = Path("templates", "crd")
+BUNDLE_DIR = TEMPLATES
+BASES = ("v1", "v1beta1")
+
+
+def _bundle(base: str) -> Path:
+    return BUNDLE_DIR / f"bundle-{base}.json"
+
+
+def _templates(base: str) -> List[Path]:
+    return sorted((TEMPLATES / base).glob("*.yaml"))
+
+
+def source_hash(base: str) -> str:
+    """Hash the names and contents of the YAML templates of a CRD base."""
+    digest = hashlib.sha256()
+    for path in _templates(base):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def parse(base: str) -> List[dict]:
+    """Parse and validate the YAML templates of a CRD base, sorted by name."""
+    docs = []
+    for path in _templates(base):
+        for doc in yaml.load_all(path.read_text(), Loader=Loader):
+            if not doc:
+                continue
+            if doc.get("kind") != "CustomResourceDefinition" or not doc["metadata"].get("name"):
+                raise ValueError(f"{path} contains an unnamed or non-CRD document")
+            docs.append(doc)
+    return sorted(docs, key=lambda r: r["metadata"]["name"])
+
+
+def build(base: str) -> Mapping[str, Any]:
+    """Build the bundle content for a CRD base."""
+    return {"hash": source_hash(base), "resources": parse(base)}
+
+
+def load(base: str, digest: str) -> Optional[List[dict]]:
+    """Load a CRD base from its bundle, if it was built from templates matching digest."""
+    bundle = _bundle(base)
+    if not bundle.exists():
+        return None
+    try:
+        entry = json.loads(bundle.read_text())
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable CRD bundle {bundle}: {e}")
+        return None
+    if not isinstance(entry, dict) or entry.get("hash") != digest:
+        log.warning(f"Ignoring CRD bundle {bundle}, it doesn't match the {base} templates")
+        return None
+    return entry["resources"]
+
+
+if __name__ == "__main__":  # pragma: nocover
+    for base in BASES:
+        _bundle(base).write_text(json.dumps(build(base)) + "\n")
@@ -1,20 +1,99 @@
 """Apply extra manifests for enabling the scheduler and its config."""
 
+import hashlib
+import json
 import logging
+import threading
+import time
+from functools import cached_property, partial
 from pathlib import Path
-from typing import List, Sequence
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple, Type
 
 from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
+from charms.volcano.v0.manifest_utils import (
+    ManifestError,
+    Timings,
+    comparable,
+    delete_collection,
+    diff_fields,
+    run_concurrently,
+)
 from lightkube import Client, codecs
 from lightkube.core.exceptions import ApiError
 from lightkube.core.resource import Resource
-from lightkube.generic_resource import load_in_cluster_generic_resources
+from lightkube.generic_resource import create_resources_from_crd, get_generic_resource
 from lightkube.models.core_v1 import ServicePort
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
 from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.coordination_v1 import Lease
 from ops.model import ModelError
 
+import crd_bundle
+from config import load_queues
+
 log = logging.getLogger(__name__)
 CRD_BASE = "v1"  # assumes we're in a k8s cluster that has access to v1 CRDs
+CACHE_DIR = Path(".manifest-cache")  # relative to the charm dir, survives between hooks
+HASH_ANNOTATION = "juju.io/manifest-hash"
+OWNER_LABEL = "juju.io/application"
+NON_VALIDATING = ("description", "example", "externalDocs", "title")
+VOLCANO_GROUP = "volcano.sh"
+QUEUE_VERSION, QUEUE_KIND = "scheduling.volcano.sh/v1beta1", "Queue"
+ESTABLISHED_TIMEOUT = 60  # seconds to wait for the CRDs to be served
+MAX_DIFF_FIELDS = 50  # changed fields reported per object
+LEASE_NAME = "vc-scheduler"  # fixed by vc-scheduler, in its --lock-object-namespace
+_REGISTERED_CRDS: Set[str] = set()  # generic resources registered during this hook
+
+
+class CRDsNotEstablishedError(ManifestError):
+    """Raised when resources depending on the CRDs can't be applied yet."""
+
+    def __init__(self):
+        super().__init__({"CustomResourceDefinitions": TimeoutError("not established")})
+
+
+def _stamp(obj: Resource) -> str:
+    """Annotate a resource with the hash of its content, returning the hash."""
+    annotations = obj.metadata.annotations = obj.metadata.annotations or {}
+    annotations.pop(HASH_ANNOTATION, None)
+    content = json.dumps(obj.to_dict(), sort_keys=True).encode()
+    annotations[HASH_ANNOTATION] = digest = hashlib.sha256(content).hexdigest()
+    return digest
+
+
+def _applied_hash(obj: Resource) -> Optional[str]:
+    return (obj.metadata.annotations or {}).get(HASH_ANNOTATION)
+
+
+def _strip_schema(schema: dict) -> dict:
+    """Drop the non-validating annotations from an OpenAPI v3 schema, in place."""
+    for key in NON_VALIDATING:
+        schema.pop(key, None)
+    for key in ("properties", "patternProperties", "definitions"):
+        for sub_schema in (schema.get(key) or {}).values():
+            _strip_schema(sub_schema)
+    for key in ("items", "additionalProperties", "not"):
+        if isinstance(schema.get(key), dict):
+            _strip_schema(schema[key])
+    for key in ("allOf", "anyOf", "oneOf"):
+        for sub_schema in schema.get(key) or []:
+            _strip_schema(sub_schema)
+    return schema
+
+
+def _strip_crd(obj: dict) -> dict:
+    """Drop the non-validating annotations from every version of a CRD, in place."""
+    for version in obj["spec"].get("versions") or []:
+        schema = (version.get("schema") or {}).get("openAPIV3Schema")
+        if schema:
+            _strip_schema(schema)
+    return obj
+
+
+def _established(crd: CustomResourceDefinition) -> bool:
+    conditions = (crd.status and crd.status.conditions) or []
+    return any(c.type == "Established" and c.status == "True" for c in conditions)
 
 
 class Manifests:
@@ -25,17 +104,100 @@ class Manifests:
         self.namespace = charm.model.name
         self.application = charm.app.name
         self.client = Client(namespace=self.namespace, field_manager=self.application)
-        load_in_cluster_generic_resources(self.client)
+        self.cache_dir = Path(charm.charm_dir, CACHE_DIR)
+        self.timings = Timings.load(charm)
 
         self.service_port = ServicePort(8080, name=self.application, protocol="TCP")
         self.service_patcher = KubernetesServicePatch(charm, [self.service_port])
 
+    @property
+    def _labels(self) -> Dict[str, str]:
+        return {OWNER_LABEL: self.application}
+
+    @property
+    def manage_crds(self) -> bool:
+        """Whether this scheduler shard applies the Volcano CRDs."""
+        return self._charm.config["manage-crds"]
+
     @property
     def _resources(self) -> Sequence[Resource]:
-        templates = Path("templates", "crd", CRD_BASE).glob("*.yaml")
-        for _ in templates:
-            for obj in codecs.load_all_yaml(_.resolve().open()):
-                yield obj
+        crds = self._crds if self.manage_crds else []
+        return [*crds, *self._queues]
+
+    @property
+    def _queues(self) -> List[Resource]:
+        queue = self.generic_resource(QUEUE_VERSION, QUEUE_KIND)
+        return [
+            queue(
+                apiVersion=QUEUE_VERSION,
+                kind=QUEUE_KIND,
+                metadata=ObjectMeta(name=name, labels=self._labels),
+                spec={"weight": 1, "reclaimable": True},
+            )
+            for name in load_queues(self._charm)
+        ]
+
+    @cached_property
+    def _crds(self) -> List[Resource]:
+        """Parsed CRD templates, from the prebuilt bundle or the on-disk cache when current."""
+        digest = crd_bundle.source_hash(CRD_BASE)
+        cache_file = self.cache_dir / f"crd-{CRD_BASE}-{digest}.json"
+
+        with self.timings.measure("render", "templates", f"crd/{CRD_BASE}"):
+            objs = crd_bundle.load(CRD_BASE, digest)
+            if objs is None:
+                objs = self._read_cache(cache_file)
+            if objs is None:
+                objs = crd_bundle.parse(CRD_BASE)
+                self._write_cache(cache_file, objs)
+            if self._charm.config["strip-crd-descriptions"]:
+                objs = [_strip_crd(obj) for obj in objs]
+        resources = []
+        for raw in objs:
+            with self.timings.measure("parse", raw["kind"], raw["metadata"]["name"]):
+                obj = codecs.from_dict(raw)
+            obj.metadata.labels = {**(obj.metadata.labels or {}), **self._labels}
+            resources.append(obj)
+        return resources
+
+    @staticmethod
+    def _read_cache(cache_file: Path) -> Optional[List[dict]]:
+        if not cache_file.exists():
+            return None
+        try:
+            return json.loads(cache_file.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable manifest cache {cache_file}: {e}")
+            return None
+
+    @staticmethod
+    def _write_cache(cache_file: Path, objs: List[dict]):
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            for stale in cache_file.parent.glob(f"crd-{CRD_BASE}-*.json"):
+                stale.unlink()
+            tmp_file = cache_file.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(objs))
+            tmp_file.replace(cache_file)
+        except OSError as e:
+            log.warning(f"Failed to write manifest cache {cache_file}: {e}")
+
+    def _load_generic_resources(self):
+        """Register generic resources for the Volcano CRDs the first time they're needed.
+
+        The resources come from the charm's own CRD templates, so no CRDs are listed
+        from the cluster.
+        """
+        for crd in self._crds:
+            name = crd.metadata.name
+            if crd.spec.group.endswith(VOLCANO_GROUP) and name not in _REGISTERED_CRDS:
+                create_resources_from_crd(crd)
+                _REGISTERED_CRDS.add(name)
+
+    def generic_resource(self, version: str, kind: str) -> Type[Resource]:
+        """Get the generic resource for a Volcano CRD version and kind."""
+        self._load_generic_resources()
+        return get_generic_resource(version, kind)
 
     @property
     def _patches(self) -> Sequence[dict]:
@@ -74,7 +236,9 @@ class Manifests:
     ):
         """Delete a resource."""
         try:
-            self.client.delete(resource_type, name, namespace=namespace)
+            rtype = resource_type._api_info.resource.kind
+            with self.timings.measure("delete", rtype, name):
+                self.client.delete(resource_type, name, namespace=namespace)
         except ApiError as err:
             if err.status.message is not None:
                 err_lower = err.status.message.lower()
@@ -83,6 +247,10 @@ class Manifests:
                 elif "(unauthorized)" in err_lower and ignore_unauthorized:
                     # Ignore error from https://bugs.launchpad.net/juju/+bug/1941655
                     log.warning(f"Ignoring unauthorized error: {err.status.message}")
+                elif "denied the request" in err_lower and rtype == QUEUE_KIND:
+                    # Volcano's queue webhook only deletes Closed queues. The rest go
+                    # with the CRDs, or are left for the cluster admin to close.
+                    log.warning(f"Ignoring rejected queue delete: {err.status.message}")
                 else:
                     log.exception(
                         "ApiError encountered while attempting to delete resource: "
@@ -93,17 +261,169 @@ class Manifests:
                 log.exception("ApiError encountered while attempting to delete resource.")
                 raise
         else:
-            rtype = resource_type._api_info.resource.kind
             log.info(f"Deleted {rtype}({name}, namespace={namespace})")
 
+    def _live_objects(self, resources: Sequence[Resource]) -> Dict[tuple, Resource]:
+        """List each kind of resource owned by this charm once, keyed by kind and name."""
+        live = {}
+        for kind in {type(obj) for obj in resources}:
+            try:
+                for obj in self.client.list(kind, labels=self._labels):
+                    live[kind, obj.metadata.name, obj.metadata.namespace] = obj
+            except ApiError as err:
+                log.warning(f"Cannot list {kind.__name__}: {err.status.message}")
+        return live
+
     def apply(self):
         """Apply all manifests managed by this charm."""
-        for obj in self._sorted_resources:
-            self.client.apply(obj)
-        for patch in self._sorted_patches:
-            self.client.patch(**patch)
+        try:
+            self._apply()
+        finally:
+            self.timings.save()
+
+    def _apply(self):
+        resources = self._sorted_resources
+        live = self._live_objects(resources)
+        changed = []
+        for obj in resources:
+            # stamp every object, so those applied for the first time can be skipped next
+            stamp = _stamp(obj)
+            current = live.get((type(obj), obj.metadata.name, obj.metadata.namespace))
+            if current and _applied_hash(current) == stamp:
+                log.info(f"Skipping unchanged {obj.kind}({obj.metadata.name})")
+                continue
+            changed.append(obj)
+
+        # CRDs must be served before any resource which depends on them
+        crds = [obj for obj in changed if obj.kind == "CustomResourceDefinition"]
+        others = [obj for obj in changed if obj.kind != "CustomResourceDefinition"]
+        for stage in (crds, others):
+            if stage is others and others and not self.wait_for_established():
+                raise CRDsNotEstablishedError()
+            run_concurrently(
+                {
+                    f"{obj.kind}({obj.metadata.name})": self.timings.timed(
+                        "apply",
+                        obj.kind,
+                        obj.metadata.name,
+                        partial(self.client.apply, obj),
+                    )
+                    for obj in stage
+                }
+            )
+        run_concurrently(
+            {
+                f"{patch['res'].__name__}({patch['name']})": self.timings.timed(
+                    "patch",
+                    patch["res"].__name__,
+                    patch["name"],
+                    partial(self.client.patch, **patch),
+                )
+                for patch in self._sorted_patches
+            }
+        )
         self._patch_service()
 
+    def _get_live(self, obj: Resource, live: Mapping[tuple, Resource]) -> Optional[Resource]:
+        key = type(obj), obj.metadata.name, obj.metadata.namespace
+        if key in live:
+            return live[key]
+        try:
+            # not labelled as owned by this charm, possibly applied by an older revision
+            return self.client.get(type(obj), obj.metadata.name, namespace=obj.metadata.namespace)
+        except ApiError as err:
+            if err.status.code == 404:
+                return None
+            raise
+
+    def diff(self) -> Dict[str, List[str]]:
+        """Report the fields each manifest would change, with a server-side dry-run apply."""
+        changes = {}
+
+        def _record(name, current, dry_run):
+            fields = diff_fields(comparable(current.to_dict()), comparable(dry_run.to_dict()))
+            if len(fields) > MAX_DIFF_FIELDS:
+                more = len(fields) - MAX_DIFF_FIELDS
+                fields = fields[:MAX_DIFF_FIELDS] + [f"... and {more} more"]
+            if fields:
+                changes[name] = fields
+
+        resources = self._sorted_resources
+        live = self._live_objects(resources)
+        for obj in resources:
+            name = f"{obj.kind}({obj.metadata.name})"
+            current = self._get_live(obj, live)
+            if current is None:
+                changes[name] = ["<created>"]
+            elif _applied_hash(current) != _stamp(obj):
+                _record(name, current, self.client.apply(obj, dry_run=True))
+
+        for patch in self._sorted_patches:
+            name = f"{patch['res'].__name__}({patch['name']})"
+            current = self.client.get(patch["res"], patch["name"], namespace=patch["namespace"])
+            _record(name, current, self.client.patch(**patch, dry_run=True))
+        return changes
+
+    def _crd_watches(self, pending: Set[str]) -> List[Tuple[Set[str], dict]]:
+        """Select the CRDs to watch, with the names each watch waits for."""
+        if self.manage_crds:
+            return [(set(pending), dict(labels=self._labels))]
+        # another scheduler shard may have applied the CRDs, so watch each by name
+        # rather than every CRD in the cluster
+        return [({name}, dict(fields={"metadata.name": name})) for name in sorted(pending)]
+
+    def _watch_established(self, pending: Set[str], names: Set[str], selector: dict, timeout):
+        """Discard CRDs from pending as they're Established, until none of names remain."""
+        try:
+            for _, crd in self.client.watch(
+                CustomResourceDefinition, server_timeout=int(timeout), **selector
+            ):
+                if _established(crd):
+                    pending.discard(crd.metadata.name)
+                if not pending & names:
+                    break
+        except ApiError as err:
+            log.error(f"Failed watching CustomResourceDefinitions: {err.status.message}")
+
+    def wait_for_established(self, timeout: float = ESTABLISHED_TIMEOUT) -> bool:
+        """Watch the charm's CRDs until each is Established, or the timeout expires."""
+        pending = {obj.metadata.name for obj in self._crds}
+        # lightkube re-opens a watch which the server closes, so each watch runs in a
+        # daemon thread and is abandoned if the timeout expires first
+        threads = [
+            threading.Thread(
+                target=self._watch_established,
+                args=(pending, names, selector, timeout),
+                daemon=True,
+            )
+            for names, selector in (self._crd_watches(pending) if pending else [])
+        ]
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        if pending:
+            log.warning(f"CustomResourceDefinitions not established: {', '.join(sorted(pending))}")
+            return False
+        return True
+
+    def lease_holder(self) -> Optional[str]:
+        """Name the unit holding the scheduler's leader election lease, if any."""
+        try:
+            lease = self.client.get(Lease, LEASE_NAME, namespace=self.namespace)
+        except ApiError as err:
+            if err.status.code == 404:
+                return None
+            raise
+        identity = lease.spec and lease.spec.holderIdentity
+        if not identity:
+            return None
+        # the identity is "<hostname>_<uuid>", and a unit's hostname is its pod name
+        pod = identity.split("_", 1)[0]
+        app, _, ordinal = pod.rpartition("-")
+        return f"{app}/{ordinal}" if app and ordinal.isdigit() else pod
+
     def _patch_service(self):
         # Try to patch the service with juju 3.1 open_port
         # if this fails, try to use the K8S_Service_Patcher lib
@@ -116,7 +436,28 @@ class Manifests:
 
     def delete_manifest(self, ignore_not_found=False, ignore_unauthorized=False):
         """Delete all manifests managed by this charm."""
+        try:
+            self._delete_manifest(ignore_not_found, ignore_unauthorized)
+        finally:
+            self.timings.save()
+
+    @property
+    def _managed_kinds(self) -> List[Type[Resource]]:
+        """Every kind of resource this charm applies, Queues first as the CRDs hold them."""
+        return [self.generic_resource(QUEUE_VERSION, QUEUE_KIND), CustomResourceDefinition]
+
+    def _delete_manifest(self, ignore_not_found, ignore_unauthorized):
+        deleted = {
+            kind
+            for kind in self._managed_kinds
+            if delete_collection(
+                self.client, kind, self._labels, self.timings, ignore_unauthorized
+            )
+        }
+        # Fall back to the rendered objects for kinds which couldn't be bulk deleted
         for obj in self._sorted_resources:
+            if type(obj) in deleted:
+                continue
             self._delete_resource(
                 type(obj),
                 obj.metadata.name,
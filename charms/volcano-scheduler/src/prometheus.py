@@ -9,15 +9,18 @@ class Prometheus:
     the metrics_endpoint relation in COS lite.
 
     :param str namespace: The namespace where kube-state-metrics is deployed.
+    :param bool scheduler_metrics: Whether to scrape the scheduler's own metrics.
     """
 
-    def __init__(self, namespace: str = "kube-system"):
+    def __init__(self, namespace: str = "kube-system", scheduler_metrics: bool = False):
         self.namespace = namespace
+        self.scheduler_metrics = scheduler_metrics
 
     @property
     def scrape_jobs(self) -> List[dict]:
         """Returns a list of scrape jobs for the Volcano charm."""
-        return [
+        jobs = [self.scheduler_job] if self.scheduler_metrics else []
+        return jobs + [
             {
                 "job_name": "kubernetes-apiservers",
                 "kubernetes_sd_configs": [{"role": "endpoints"}],
@@ -171,3 +174,13 @@ class Prometheus:
                 ],
             },
         ]
+
+    @property
+    def scheduler_job(self) -> dict:
+        """Scrape job for the metrics endpoint of every scheduler unit."""
+        # the scrape library replaces "*" with the address of each unit
+        return {
+            "job_name": "volcano-scheduler",
+            "metrics_path": "/metrics",
+            "static_configs": [{"targets": ["*:8080"]}],
+        }
@@ -3,11 +3,11 @@
 import logging
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 import yaml
 from ops.model import Container
-from ops.pebble import ExecError
+from ops.pebble import ExecError, PathError, Service
 
 from config import SchedulerArgs, SchedulerConfig
 
@@ -28,6 +28,21 @@ class Scheduler:
         healthz = f"--enable-healthz={args.enable_healthz}"
         metrics = f"--enable-metrics={args.enable_metrics}"
         loglevel = f"-v={args.loglevel}"
+        sampling = (
+            f"--minimum-feasible-nodes={args.minimum_feasible_nodes} "
+            f"--percentage-nodes-to-find={args.percentage_nodes_to_find} "
+            f"--schedule-period={args.schedule_period}"
+        )
+        kube_api = f"--kube-api-qps={args.kube_api_qps:g} --kube-api-burst={args.kube_api_burst}"
+        shard = f"--scheduler-name={args.scheduler_name}" + "".join(
+            f" --node-selector={key}:{value}" for key, value in args.node_selector
+        )
+        leader_elect = ""
+        if args.leader_elect is not None:
+            leader_elect += f" --leader-elect={str(args.leader_elect).lower()}"
+        if args.leader_elect is not False:
+            # the "vc-scheduler" lease lives in the model's namespace, not volcano-system
+            leader_elect += f" --lock-object-namespace={charm.model.name}"
 
         extra_args = args.extra_args
         extra = ""
@@ -37,7 +52,9 @@ class Scheduler:
             )
 
         self.command = (
-            f"{self.binary} {logredirect} {conf} {healthz} {metrics} {loglevel}{extra} 2>&1"
+            f"{self.binary} {logredirect} {conf} {healthz} {metrics} {loglevel} {sampling} {kube_api}"
+            f" {shard}{leader_elect}"
+            f"{extra} 2>&1"
         )
         return self
 
@@ -48,13 +65,43 @@ class Scheduler:
         return self
 
     def restart(self, container):
-        """Update pebble layer for container."""
+        """Update pebble layer for container.
+
+        The scheduler watches its config file, so when only the config changes the
+        file is pushed without restarting the running service.
+        """
         root_owned = dict(permissions=0o600, user_id=0, group_id=0)
+        path, content = self.config_file
+        service_changed = self._service_changed(container)
+        config_changed = self._current_config(container) != content
+
         container.add_layer(container.name, self._layer, combine=True)
-        container.push(*self.config_file, make_dirs=True, **root_owned)
+        if config_changed:
+            container.push(path, content, make_dirs=True, **root_owned)
+        if not service_changed and self._running(container):
+            if config_changed:
+                logger.info("Pushed scheduler config, reloading without a restart")
+            return
         container.autostart()
         container.restart(container.name)
 
+    def _service_changed(self, container: Container) -> bool:
+        current = container.get_plan().services.get(container.name)
+        desired = Service(container.name, self._layer["services"]["volcano"])
+        return current is None or current.to_dict() != desired.to_dict()
+
+    @staticmethod
+    def _current_config(container: Container) -> Optional[str]:
+        try:
+            return container.pull(CONFIG_FILE).read()
+        except PathError:
+            return None
+
+    @staticmethod
+    def _running(container: Container) -> bool:
+        service = container.get_services(container.name).get(container.name)
+        return bool(service and service.is_running())
+
     def executable(self, container) -> bool:
         """Check if container has the appropriate executable."""
         path, file = self.binary.parent, self.binary.name
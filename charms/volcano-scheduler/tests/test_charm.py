@@ -3,10 +3,13 @@
 import unittest.mock as mock
 
 import pytest
+from ops.charm import PebbleReadyEvent
 from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.pebble import ConnectionError
+from ops.testing import ActionFailed
 
 from charm import CharmVolcano
+from manifests import CRDsNotEstablishedError
 
 
 def test_container_not_ready(harness):
@@ -59,6 +62,38 @@ def test_container_ready(mock_manifest, mock_scheduler, harness, conn_err):
         harness.charm.unit.status == MaintenanceStatus()
 
 
+@mock.patch("charm.Scheduler")
+@mock.patch("charm.Manifests")
+def test_crds_not_established(mock_manifest, mock_scheduler, harness):
+    mock_manifest.return_value.wait_for_established.return_value = False
+    sched_inst = mock_scheduler.return_value
+    sched_inst.executable.return_value = True
+
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    container = harness.model.unit.get_container(CharmVolcano.CONTAINER)
+    harness.charm.on.volcano_pebble_ready.emit(container)
+
+    sched_inst.restart.assert_not_called()
+    assert harness.charm.unit.status == WaitingStatus("Waiting for Volcano CRDs to be established")
+
+
+@mock.patch("charm.Scheduler")
+@mock.patch("charm.Manifests")
+def test_queues_before_crds_established(mock_manifest, mock_scheduler, harness):
+    mock_manifest.return_value.apply.side_effect = CRDsNotEstablishedError()
+    sched_inst = mock_scheduler.return_value
+    sched_inst.executable.return_value = True
+
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    container = harness.model.unit.get_container(CharmVolcano.CONTAINER)
+    with mock.patch.object(PebbleReadyEvent, "defer") as defer:
+        harness.charm.on.volcano_pebble_ready.emit(container)
+
+    defer.assert_called_once_with()
+    sched_inst.restart.assert_not_called()
+    assert harness.charm.unit.status == WaitingStatus("Waiting for Volcano CRDs to be established")
+
+
 @mock.patch("charm.Scheduler")
 def test_leader_set(mock_scheduler, harness):
     # Get the plan now we've run PebbleReady
@@ -71,13 +106,81 @@ def test_leader_set(mock_scheduler, harness):
 
 def test_update_status_ready(harness):
     # Get the plan now we've run PebbleReady
+    harness.update_config({"leader-elect": False})
     harness.set_can_connect(CharmVolcano.CONTAINER, True)
     harness.charm.on.update_status.emit()
     assert harness.charm.unit.status == ActiveStatus()
 
 
+@pytest.mark.parametrize("config", [{}, {"leader-elect": True}], ids=["unset", "enabled"])
+@pytest.mark.parametrize(
+    "holder, message",
+    [
+        ("volcano-scheduler/0", "Leading"),
+        ("volcano-scheduler/1", "Standby, lease held by volcano-scheduler/1"),
+        (None, "Electing a leader"),
+    ],
+)
+@mock.patch("charm.Manifests")
+def test_update_status_lease_holder(mock_manifest, harness, holder, message, config):
+    harness.update_config(config)
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    mock_manifest.return_value.lease_holder.return_value = holder
+    harness.charm.on.update_status.emit()
+    assert harness.charm.unit.status == ActiveStatus(message)
+
+
 def test_update_status_unready(harness):
     # Get the plan now we've run PebbleReady
     harness.set_can_connect(CharmVolcano.CONTAINER, False)
     harness.charm.on.update_status.emit()
     assert harness.charm.unit.status == WaitingStatus("Scheduler Not Ready")
+
+
+@mock.patch("charm.Scheduler")
+@mock.patch("charm.Manifests")
+def test_config_changed_reapplies(mock_manifest, mock_scheduler, harness):
+    mock_scheduler.return_value.executable.return_value = True
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    harness.update_config({"strip-crd-descriptions": True})
+    mock_manifest.return_value.apply.assert_called_once_with()
+
+
+def _job_names(jobs):
+    return [job["job_name"] for job in jobs]
+
+
+@mock.patch("charm.Scheduler")
+@mock.patch("charm.Manifests")
+def test_scheduler_metrics_scrape_job(mock_manifest, mock_scheduler, harness):
+    assert "volcano-scheduler" in _job_names(harness.charm.prometheus.scrape_jobs)
+    with mock.patch.object(harness.charm.metrics_endpoint, "update_scrape_job_spec") as update:
+        harness.update_config({"enable-metrics": False})
+    (jobs,), _ = update.call_args
+    assert "volcano-scheduler" not in _job_names(jobs)
+    assert "kube-state-metrics" in _job_names(jobs)
+
+
+@mock.patch("charm.Manifests")
+def test_invalid_scheduler_config_blocks(mock_manifest, harness):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    harness.update_config({"scheduler-profile": "custom", "scheduler-config": "actions: ["})
+    assert isinstance(harness.charm.unit.status, BlockedStatus)
+    assert "scheduler-config isn't valid YAML" in harness.charm.unit.status.message
+    container = harness.model.unit.get_container(CharmVolcano.CONTAINER)
+    assert not container.exists("/volcano.scheduler/volcano-scheduler.yaml")
+    mock_manifest.return_value.apply.assert_not_called()
+
+
+@mock.patch("charm.Manifests")
+def test_diff_manifests_action(mock_manifest, harness):
+    mock_manifest.return_value.diff.return_value = {"Kind(name)": ["spec.field"]}
+    output = harness.run_action("diff-manifests")
+    assert output.results == {"changed": 1, "diff": "Kind(name):\n- spec.field\n"}
+
+
+@mock.patch("manifests.KubernetesServicePatch")
+def test_diff_manifests_action_invalid_config(_ksp, harness):
+    harness.update_config({"queues": "Batch"})
+    with pytest.raises(ActionFailed, match="queues: 'Batch' isn't a valid queue name"):
+        harness.run_action("diff-manifests")
@@ -0,0 +1,207 @@
+import pytest
+
+from config import (
+    DEFAULT_CONFIG,
+    PROFILES,
+    ConfigError,
+    SchedulerArgs,
+    SchedulerConfig,
+    load_queues,
+)
+
+CUSTOM = """
+actions: "enqueue,allocate"
+tiers:
+- plugins:
+  - name: priority
+  - name: gang
+    enablePreemptable: false
+  - name: binpack
+    arguments:
+      binpack.weight: 10
+"""
+
+
+def test_default_profile(harness):
+    assert SchedulerConfig.load(harness.charm) == DEFAULT_CONFIG
+
+
+@pytest.mark.parametrize("profile", ["throughput", "dense-binpack", "fair-share"])
+def test_named_profiles(harness, profile):
+    harness.update_config({"scheduler-profile": profile})
+    config = SchedulerConfig.load(harness.charm)
+    assert config == PROFILES[profile]
+    # every profile is itself a valid document
+    assert SchedulerConfig.from_dict(config.asdict()) == config
+
+
+def test_custom_profile(harness):
+    harness.update_config({"scheduler-profile": "custom", "scheduler-config": CUSTOM})
+    config = SchedulerConfig.load(harness.charm)
+    assert config.actions == "enqueue, allocate"
+    (tier,) = config.tiers
+    assert [p["name"] for p in tier["plugins"]] == ["priority", "gang", "binpack"]
+    assert tier["plugins"][2]["arguments"] == {"binpack.weight": 10}
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        ({"scheduler-profile": "unknown"}, "Unknown scheduler-profile 'unknown'"),
+        ({"scheduler-profile": "custom"}, "scheduler-profile=custom requires scheduler-config"),
+        ({"scheduler-config": CUSTOM}, "scheduler-config requires scheduler-profile=custom"),
+    ],
+)
+def test_profile_errors(harness, config, message):
+    harness.update_config(config)
+    with pytest.raises(ConfigError, match=message):
+        SchedulerConfig.load(harness.charm)
+
+
+@pytest.mark.parametrize(
+    "document, message",
+    [
+        ("actions: [", "isn't valid YAML"),
+        ("- actions", "document: expected a mapping"),
+        ("{actions: allocate, tiers: [], extra: 1}", r"document: unknown keys \['extra'\]"),
+        ("{tiers: [{plugins: [{name: gang}]}]}", "actions: expected a comma separated"),
+        ("{actions: 'allocate, schedule', tiers: []}", "actions: unknown action 'schedule'"),
+        ("{actions: allocate, tiers: []}", "tiers: expected a non-empty list"),
+        ("{actions: allocate, tiers: [{plugins: []}]}", r"tiers\[0\]: expected a non-empty"),
+        ("{actions: allocate, tiers: [{plugins: [{name: nope}]}]}", "known plugin name"),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: gang, enableJobOrder: 'yes'}]}]}",
+            r"tiers\[0\].plugins\[0\].enableJobOrder: expected a boolean",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: gang, arguments: []}]}]}",
+            r"plugins\[0\].arguments: expected a mapping",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: gang, weight: 1}]}]}",
+            r"plugins\[0\]: unknown key 'weight'",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: gang, enableFoo: true}]}]}",
+            r"plugins\[0\]: unknown key 'enableFoo'",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: gang, arguments: {a: {b: 1}}}]}]}",
+            r"plugins\[0\].arguments.a: expected a scalar",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: binpack, arguments: {binpack.cpu: '1'}}]}]}",
+            r"plugins\[0\].arguments.binpack.cpu: expected int",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: binpack, arguments: {binpack.cpu: true}}]}]}",
+            r"plugins\[0\].arguments.binpack.cpu: expected int",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: overcommit, arguments: {overcommit-factor: x}}]}]}",
+            r"arguments.overcommit-factor: expected float",
+        ),
+        (
+            "{actions: allocate, tiers: [{plugins: [{name: predicates, arguments: {predicate.Cache: true}}]}]}",
+            r"arguments: unknown predicates argument 'predicate.Cache'",
+        ),
+    ],
+)
+def test_custom_profile_invalid(harness, document, message):
+    harness.update_config({"scheduler-profile": "custom", "scheduler-config": document})
+    with pytest.raises(ConfigError, match=message):
+        SchedulerConfig.load(harness.charm)
+
+
+def test_plugin_arguments_and_flags():
+    config = SchedulerConfig.from_dict(
+        {
+            "actions": "allocate",
+            "tiers": [
+                {
+                    "plugins": [
+                        {"name": "drf", "enableHierarchy": True, "EnabledClusterOrder": False},
+                        {"name": "overcommit", "arguments": {"overcommit-factor": 2}},
+                        {
+                            "name": "binpack",
+                            "enableNodeOrder": True,
+                            "arguments": {
+                                "binpack.weight": 10,
+                                "binpack.resources": "nvidia.com/gpu",
+                                "binpack.resources.nvidia.com/gpu": 2,
+                            },
+                        },
+                        {"name": "usage", "arguments": {"usage.weight": 5, "type": "average"}},
+                    ]
+                }
+            ],
+        }
+    )
+    drf, overcommit, binpack, usage = config.tiers[0]["plugins"]
+    assert drf == {"name": "drf", "enableHierarchy": True, "EnabledClusterOrder": False}
+    assert overcommit["arguments"] == {"overcommit-factor": 2}
+    assert binpack["arguments"]["binpack.resources.nvidia.com/gpu"] == 2
+    assert usage["arguments"]["type"] == "average"
+
+
+def test_scheduler_args(harness):
+    assert SchedulerArgs.load(harness.charm) == SchedulerArgs()
+    harness.update_config(
+        {
+            "minimum-feasible-nodes": 50,
+            "percentage-nodes-to-find": 10,
+            "schedule-period": "1m30s",
+        }
+    )
+    args = SchedulerArgs.load(harness.charm)
+    assert args.minimum_feasible_nodes == 50
+    assert args.percentage_nodes_to_find == 10
+    assert args.schedule_period == "1m30s"
+    harness.update_config({"enable-metrics": False})
+    assert SchedulerArgs.load(harness.charm).enable_metrics == "false"
+
+
+def test_scheduler_args_leader_elect(harness):
+    assert SchedulerArgs.load(harness.charm).leader_elect is None
+    harness.update_config({"leader-elect": False})
+    assert SchedulerArgs.load(harness.charm).leader_elect is False
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        ({"minimum-feasible-nodes": 0}, "minimum-feasible-nodes must be at least 1"),
+        ({"percentage-nodes-to-find": -1}, "percentage-nodes-to-find must be between"),
+        ({"percentage-nodes-to-find": 101}, "percentage-nodes-to-find must be between"),
+        ({"schedule-period": "1"}, "schedule-period '1' isn't a positive duration"),
+        ({"schedule-period": "0s"}, "schedule-period '0s' isn't a positive duration"),
+        ({"schedule-period": "soon"}, "schedule-period 'soon' isn't a positive duration"),
+        ({"scheduler-name": "Not_Valid"}, "scheduler-name 'Not_Valid' isn't a valid name"),
+        ({"node-selector": "role"}, "node-selector: 'role' isn't a valid key=value label"),
+        ({"node-selector": "a=b,=c"}, "node-selector: '=c' isn't a valid key=value label"),
+        ({"node-selector": "zone=a zone=a"}, "node-selector: 'zone=a' is repeated"),
+    ],
+)
+def test_scheduler_args_invalid(harness, config, message):
+    harness.update_config(config)
+    with pytest.raises(ConfigError, match=message):
+        SchedulerArgs.load(harness.charm)
+
+
+def test_queues(harness):
+    assert load_queues(harness.charm) == []
+    harness.update_config({"queues": "inference, batch-cpu,,inference"})
+    assert load_queues(harness.charm) == ["batch-cpu", "inference"]
+
+
+@pytest.mark.parametrize(
+    "queues, message",
+    [
+        ("Batch", "queues: 'Batch' isn't a valid queue name"),
+        ("a, default", "queues: 'default' is managed by Volcano"),
+    ],
+)
+def test_queues_invalid(harness, queues, message):
+    harness.update_config({"queues": queues})
+    with pytest.raises(ConfigError, match=message):
+        load_queues(harness.charm)
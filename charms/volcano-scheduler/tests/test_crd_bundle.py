@@ -0,0 +1,64 @@
+import json
+import unittest.mock as mock
+
+import pytest
+
+import crd_bundle
+from manifests import Manifests
+
+
+@pytest.fixture()
+def bundle_dir(tmp_path):
+    for base in crd_bundle.BASES:
+        (tmp_path / f"bundle-{base}.json").write_text(json.dumps(crd_bundle.build(base)))
+    with mock.patch("crd_bundle.BUNDLE_DIR", tmp_path):
+        yield tmp_path
+
+
+@pytest.mark.parametrize("base", crd_bundle.BASES)
+def test_committed_bundle_matches_templates(base):
+    # Fails when the YAML templates change, until the bundles are regenerated with
+    #   python3 src/crd_bundle.py
+    entry = json.loads((crd_bundle.TEMPLATES / f"bundle-{base}.json").read_text())
+    assert entry["hash"] == crd_bundle.source_hash(base)
+    assert entry["resources"] == crd_bundle.parse(base)
+
+
+def test_load_reads_one_base(bundle_dir, caplog):
+    (bundle_dir / "bundle-v1beta1.json").write_text("not-json")
+    with mock.patch("crd_bundle.parse") as mock_parse:
+        resources = crd_bundle.load("v1", crd_bundle.source_hash("v1"))
+    mock_parse.assert_not_called()
+    assert [r["apiVersion"] for r in resources] == ["apiextensions.k8s.io/v1"] * 5
+    assert caplog.text == ""
+
+
+def test_bundle_missing(tmp_path):
+    with mock.patch("crd_bundle.BUNDLE_DIR", tmp_path):
+        assert crd_bundle.load("v1", crd_bundle.source_hash("v1")) is None
+
+
+def test_bundle_stale(bundle_dir, caplog):
+    assert crd_bundle.load("v1", "not-the-template-hash") is None
+    assert "doesn't match the v1 templates" in caplog.text
+
+
+def test_bundle_unreadable(bundle_dir, caplog):
+    (bundle_dir / "bundle-v1.json").write_text("not-json")
+    assert crd_bundle.load("v1", crd_bundle.source_hash("v1")) is None
+    assert "Ignoring unreadable CRD bundle" in caplog.text
+
+
+def test_manifests_use_bundle(harness):
+    with mock.patch("manifests.KubernetesServicePatch"):
+        manifests = Manifests(harness.charm)
+    with mock.patch("crd_bundle.parse") as mock_parse:
+        resources = manifests._sorted_resources
+    mock_parse.assert_not_called()
+    assert [r.metadata.name for r in resources] == [
+        "commands.bus.volcano.sh",
+        "jobs.batch.volcano.sh",
+        "numatopologies.nodeinfo.volcano.sh",
+        "podgroups.scheduling.volcano.sh",
+        "queues.scheduling.volcano.sh",
+    ]
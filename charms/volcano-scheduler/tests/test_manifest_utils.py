@@ -0,0 +1,145 @@
+import json
+import logging
+import unittest.mock as mock
+from pathlib import Path
+
+import pytest
+from charms.volcano.v0 import manifest_utils
+from charms.volcano.v0.manifest_utils import (
+    ManifestError,
+    Timings,
+    comparable,
+    delete_collection,
+    diff_fields,
+    read_timings,
+    run_concurrently,
+)
+from lightkube.core.exceptions import ApiError
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from ops.testing import ActionFailed
+
+LABELS = {"juju.io/application": "volcano-scheduler"}
+VENDORED = ("volcano-admission", "volcano-controllers")
+
+
+def _api_error(message):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message=message)
+    return ApiError(response=mock_response)
+
+
+@pytest.mark.parametrize("charm", VENDORED)
+def test_vendored_copies_match(charm):
+    lib = Path(manifest_utils.__file__).resolve()
+    vendored = lib.parents[5] / charm / "lib/charms/volcano/v0" / lib.name
+    assert vendored.read_text() == lib.read_text()
+
+
+def test_diff_fields():
+    assert diff_fields({"a": 1, "b": 2}, {"b": 3, "c": 4}) == ["a", "b", "c"]
+    assert diff_fields({"a": [1, 2]}, {"a": [1, 2, 3]}) == ["a"]
+    assert diff_fields({"a": [{"b": 1}]}, {"a": [{"b": 2}]}) == ["a[0].b"]
+
+
+def test_comparable():
+    obj = {
+        "kind": "Kind",
+        "metadata": {"name": "a", "resourceVersion": "1", "uid": "x"},
+        "status": {"ready": True},
+    }
+    assert comparable(obj) == {"kind": "Kind", "metadata": {"name": "a"}}
+
+
+def test_timings_measure(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    timings = Timings(tmp_path / "timings.json", enabled=True)
+    with timings.measure("apply", "Kind", "name"):
+        pass
+    timings.timed("patch", "Kind", "other", lambda: None)()
+    timings.save()
+    saved = json.loads((tmp_path / "timings.json").read_text())
+    assert [(r["operation"], r["name"]) for r in saved] == [("apply", "name"), ("patch", "other")]
+    assert "Timing operation=apply kind=Kind name=name" in caplog.text
+
+
+def test_timings_disabled(tmp_path):
+    timings = Timings(tmp_path / "timings.json", enabled=False)
+    with timings.measure("apply", "Kind", "name"):
+        pass
+    timings.save()
+    assert timings.records == []
+    assert not (tmp_path / "timings.json").exists()
+
+
+def test_timings_load(harness, manifest_timings):
+    harness.update_config({"manifest-timings": True})
+    timings = Timings.load(harness.charm)
+    assert timings.enabled
+    assert timings.path == Path(harness.charm.charm_dir, manifest_timings)
+
+
+def test_read_timings_unreadable(manifest_timings):
+    assert read_timings(manifest_timings.parent) is None
+    manifest_timings.write_text("not json")
+    assert read_timings(manifest_timings.parent) is None
+
+
+def test_run_concurrently_aggregates_errors():
+    calls = []
+    tasks = {
+        "ok": lambda: calls.append("ok"),
+        "bad": mock.MagicMock(side_effect=ValueError("boom")),
+    }
+    with pytest.raises(ManifestError, match="Failed to apply 1 object") as exc_info:
+        run_concurrently(tasks)
+    assert calls == ["ok"]
+    assert list(exc_info.value.errors) == ["bad"]
+
+
+def test_delete_collection(lightkube_client, caplog):
+    caplog.set_level(logging.INFO)
+    timings = Timings(Path("unused"), enabled=False)
+    assert delete_collection(lightkube_client, CustomResourceDefinition, LABELS, timings)
+    lightkube_client._client.request.assert_called_once_with(
+        "deletecollection",
+        res=CustomResourceDefinition,
+        params={"labelSelector": "juju.io/application=volcano-scheduler"},
+    )
+    assert "Deleted CustomResourceDefinition collection" in caplog.text
+
+
+def test_delete_collection_unauthorized(lightkube_client):
+    timings = Timings(Path("unused"), enabled=False)
+    lightkube_client._client.request.side_effect = _api_error("Mock (unauthorized)")
+    kind = CustomResourceDefinition
+    assert delete_collection(lightkube_client, kind, LABELS, timings, ignore_unauthorized=True)
+    assert not delete_collection(lightkube_client, kind, LABELS, timings)
+
+
+def test_delete_collection_not_allowed(lightkube_client, caplog):
+    timings = Timings(Path("unused"), enabled=False)
+    lightkube_client._client.request.side_effect = _api_error("Mock Method Not Allowed")
+    assert not delete_collection(lightkube_client, CustomResourceDefinition, LABELS, timings)
+    assert "Cannot delete CustomResourceDefinition collection" in caplog.text
+
+
+def test_manifest_timings_action(harness, manifest_timings):
+    with pytest.raises(ActionFailed):
+        harness.run_action("manifest-timings")
+
+    timings = [
+        dict(operation="apply", kind="Kind", name="fast", seconds=0.01),
+        dict(operation="apply", kind="Kind", name="slow", seconds=1.5),
+    ]
+    manifest_timings.write_text(json.dumps(timings))
+    output = harness.run_action("manifest-timings")
+    assert output.results["total-seconds"] == "1.5100"
+    assert output.results["timings"].startswith("- operation: apply\n  kind: Kind\n  name: slow")
+
+
+def test_delete_collection_lightkube_changed(lightkube_client, caplog):
+    timings = Timings(Path("unused"), enabled=False)
+    del lightkube_client._client
+    assert not delete_collection(lightkube_client, CustomResourceDefinition, LABELS, timings)
+    assert "Cannot delete CustomResourceDefinition collection" in caplog.text
+    assert "with this lightkube" in caplog.text
@@ -1,12 +1,28 @@
+import json
+import logging
 import unittest.mock as mock
 
 import pytest
+from charms.volcano.v0.manifest_utils import ManifestError, read_timings
 from lightkube.core.exceptions import ApiError
 from lightkube.core.internal_resources import apiextensions
+from lightkube.models.apiextensions_v1 import (
+    CustomResourceDefinitionCondition,
+    CustomResourceDefinitionStatus,
+)
 from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.coordination_v1 import Lease
 from ops.model import ModelError
 
-from manifests import Manifests
+from manifests import (
+    HASH_ANNOTATION,
+    Manifests,
+    _applied_hash,
+    _stamp,
+    _strip_schema,
+)
+
+log = logging.getLogger(__name__)
 
 
 @pytest.fixture()
@@ -25,7 +41,16 @@ def manifests(ksp, harness):
 def test_constructor(harness, manifests, lightkube_client):
     assert manifests.namespace == harness.charm.model.name
     assert manifests.application == harness.charm.model.app.name
-    lightkube_client.list.assert_called_once_with(apiextensions.CustomResourceDefinition)
+    lightkube_client.list.assert_not_called()
+
+
+def test_generic_resource(manifests, lightkube_client):
+    queue = manifests.generic_resource("scheduling.volcano.sh/v1beta1", "Queue")
+    assert queue._api_info.resource.group == "scheduling.volcano.sh"
+    assert queue._api_info.plural == "queues"
+    assert manifests.generic_resource("batch.volcano.sh/v1alpha1", "Job")
+    assert manifests.generic_resource("example.com/v1", "Unknown") is None
+    lightkube_client.list.assert_not_called()
 
 
 def test_resources(harness, manifests):
@@ -38,6 +63,35 @@ def test_resources(harness, manifests):
     assert last.spec.group == "scheduling.volcano.sh"
 
 
+@pytest.fixture()
+def no_bundle(tmp_path):
+    # Without the committed CRD bundles, the templates are parsed and cached
+    with mock.patch("crd_bundle.BUNDLE_DIR", tmp_path / "no-bundle"):
+        yield
+
+
+def test_resources_cached(harness, ksp, manifest_cache, no_bundle):
+    first = [obj.to_dict() for obj in Manifests(harness.charm)._sorted_resources]
+    assert len(list(manifest_cache.glob("crd-v1-*.json"))) == 1
+
+    with mock.patch("crd_bundle.parse") as mock_parse:
+        second = [obj.to_dict() for obj in Manifests(harness.charm)._sorted_resources]
+    mock_parse.assert_not_called()
+    assert first == second
+
+
+def test_resources_cache_invalid(harness, ksp, manifest_cache, no_bundle):
+    manifests = Manifests(harness.charm)
+    manifests._sorted_resources
+    (cache_file,) = manifest_cache.glob("crd-v1-*.json")
+    cache_file.write_text("not-json")
+
+    manifests = Manifests(harness.charm)
+    assert len(manifests._sorted_resources) == 5
+    (rewritten,) = manifest_cache.glob("crd-v1-*.json")
+    assert rewritten.read_text() != "not-json"
+
+
 @pytest.mark.parametrize(
     "open_port", [True, False], ids=["open_port=enabled", "open_port=disabled"]
 )
@@ -50,7 +104,8 @@ def test_apply(lightkube_client, manifests, ksp, open_port):
         manifests._charm.unit, "open_port", side_effect=open_port_se
     ) as mock_open_port:
         manifests.apply()
-    calls = lightkube_client.apply.call_args_list
+    # objects are applied concurrently, so the call order isn't deterministic
+    calls = sorted(lightkube_client.apply.call_args_list, key=lambda c: c.args[0].metadata.name)
     assert len(calls) == 5
     (first,) = calls[0].args
     (last,) = calls[-1].args
@@ -78,56 +133,387 @@ def test_apply(lightkube_client, manifests, ksp, open_port):
         ksp._patch.assert_called_once_with()
 
 
-def test_successful_delete_resources(manifests, caplog):
+def test_apply_aggregates_errors(lightkube_client, manifests, caplog):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Apply Failure")
+
+    def apply_se(obj):
+        if obj.metadata.name.startswith(("commands", "queues")):
+            raise ApiError(response=mock_response)
+
+    lightkube_client.apply.side_effect = apply_se
+    with pytest.raises(ManifestError) as exc_info:
+        manifests.apply()
+
+    assert len(lightkube_client.apply.call_args_list) == 5
+    assert sorted(exc_info.value.errors) == [
+        "CustomResourceDefinition(commands.bus.volcano.sh)",
+        "CustomResourceDefinition(queues.scheduling.volcano.sh)",
+    ]
+    assert "Failed to apply 2 object(s)" in str(exc_info.value)
+    lightkube_client.patch.assert_not_called()
+
+
+def test_apply_skips_unchanged(lightkube_client, manifests):
+    resources = manifests._sorted_resources
+    unchanged, changed = resources[0], resources[1]
+    live_unchanged = apiextensions.CustomResourceDefinition.from_dict(unchanged.to_dict())
+    _stamp(live_unchanged)
+    live_changed = apiextensions.CustomResourceDefinition.from_dict(changed.to_dict())
+    live_changed.metadata.annotations = {HASH_ANNOTATION: "outdated"}
+    lightkube_client.list.return_value = [live_unchanged, live_changed]
+
+    manifests.apply()
+    applied = [call.args[0].metadata.name for call in lightkube_client.apply.call_args_list]
+    assert len(applied) == 4
+    assert unchanged.metadata.name not in applied
+    assert changed.metadata.name in applied
+    assert changed.metadata.annotations[HASH_ANNOTATION] != "outdated"
+
+
+def test_apply_stamps_new_objects(lightkube_client, manifests):
+    lightkube_client.list.return_value = []
+    manifests.apply()
+    applied = [call.args[0] for call in lightkube_client.apply.call_args_list]
+    assert len(applied) == 5
+    assert all(_applied_hash(obj) for obj in applied)
+
+    lightkube_client.apply.reset_mock()
+    lightkube_client.list.return_value = [
+        apiextensions.CustomResourceDefinition.from_dict(obj.to_dict()) for obj in applied
+    ]
+    Manifests(manifests._charm).apply()
+    lightkube_client.apply.assert_not_called()
+
+
+def _with_condition(obj, status):
+    crd = apiextensions.CustomResourceDefinition.from_dict(obj.to_dict())
+    crd.status = CustomResourceDefinitionStatus(
+        acceptedNames=crd.spec.names,
+        storedVersions=[],
+        conditions=[CustomResourceDefinitionCondition(status=status, type="Established")],
+    )
+    return crd
+
+
+def test_wait_for_established(lightkube_client, manifests):
+    resources = manifests._sorted_resources
+    events = [("ADDED", _with_condition(obj, "False")) for obj in resources]
+    events += [("MODIFIED", _with_condition(obj, "True")) for obj in resources]
+    lightkube_client.watch.return_value = iter(events)
+
+    assert manifests.wait_for_established(timeout=5)
+    lightkube_client.watch.assert_called_once_with(
+        apiextensions.CustomResourceDefinition,
+        labels={"juju.io/application": manifests.application},
+        server_timeout=5,
+    )
+
+
+def test_wait_for_established_timeout(lightkube_client, manifests, caplog):
+    resources = manifests._sorted_resources
+    lightkube_client.watch.return_value = iter(
+        [("ADDED", _with_condition(obj, "True")) for obj in resources[1:]]
+    )
+    assert not manifests.wait_for_established(timeout=0.1)
+    assert "not established: commands.bus.volcano.sh" in caplog.text
+
+
+def test_shard_resources(harness, manifests):
+    harness.update_config({"queues": "inference,batch", "manage-crds": False})
+    batch, inference = manifests._sorted_resources
+    assert (batch.kind, batch.metadata.name) == ("Queue", "batch")
+    assert inference.metadata.labels == {"juju.io/application": manifests.application}
+    assert inference.spec == {"weight": 1, "reclaimable": True}
+
+    harness.update_config({"manage-crds": True})
+    assert len(manifests._sorted_resources) == 7
+
+
+def test_apply_queues_after_established(lightkube_client, harness, manifests):
+    harness.update_config({"queues": "inference", "manage-crds": False})
+    with mock.patch.object(manifests, "wait_for_established", return_value=False):
+        with pytest.raises(ManifestError):
+            manifests.apply()
+    lightkube_client.apply.assert_not_called()
+
+    with mock.patch.object(manifests, "wait_for_established", return_value=True):
+        manifests.apply()
+    (call,) = lightkube_client.apply.call_args_list
+    assert call.args[0].metadata.name == "inference"
+
+
+def test_wait_for_established_shard(lightkube_client, harness, manifests):
+    harness.update_config({"manage-crds": False})
+    resources = {obj.metadata.name: obj for obj in manifests._crds}
+
+    def watch_se(_kind, fields, server_timeout):
+        return iter([("ADDED", _with_condition(resources[fields["metadata.name"]], "True"))])
+
+    lightkube_client.watch.side_effect = watch_se
+    assert manifests.wait_for_established(timeout=5)
+    watched = [c.kwargs["fields"] for c in lightkube_client.watch.call_args_list]
+    assert sorted(watched, key=lambda f: f["metadata.name"]) == [
+        {"metadata.name": name} for name in sorted(resources)
+    ]
+
+
+def test_diff(lightkube_client, manifests):
+    commands, jobs, *others = manifests._sorted_resources
+    unchanged = [apiextensions.CustomResourceDefinition.from_dict(o.to_dict()) for o in others]
+    for obj in unchanged:
+        _stamp(obj)
+    outdated = apiextensions.CustomResourceDefinition.from_dict(jobs.to_dict())
+    outdated.metadata.annotations[HASH_ANNOTATION] = "outdated"
+    outdated.metadata.resourceVersion = "1"
+    lightkube_client.list.return_value = [outdated, *unchanged]
+
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Not Found", code=404)
+    live_sts = mock.MagicMock()
+    live_sts.to_dict.return_value = {
+        "spec": {"template": {"spec": {"priorityClassName": "system-node-critical"}}}
+    }
+    lightkube_client.get.side_effect = [ApiError(response=mock_response), live_sts]
+
+    def dry_run_apply(obj, dry_run):
+        assert dry_run
+        applied = apiextensions.CustomResourceDefinition.from_dict(obj.to_dict())
+        applied.metadata.resourceVersion = "2"
+        applied.spec.versions[0].served = False
+        return applied
+
+    lightkube_client.apply.side_effect = dry_run_apply
+    sts = mock.MagicMock()
+    sts.to_dict.return_value = {"spec": {"template": {"spec": {"priorityClassName": None}}}}
+    lightkube_client.patch.return_value = sts
+
+    changes = manifests.diff()
+    assert changes == {
+        "CustomResourceDefinition(commands.bus.volcano.sh)": ["<created>"],
+        "CustomResourceDefinition(jobs.batch.volcano.sh)": [
+            f"metadata.annotations.{HASH_ANNOTATION}",
+            "spec.versions[0].served",
+        ],
+        "StatefulSet(volcano-scheduler)": ["spec.template.spec.priorityClassName"],
+    }
+    assert lightkube_client.apply.call_count == 1
+    assert lightkube_client.patch.call_args.kwargs["dry_run"] is True
+
+
+def test_stamp_is_stable(manifests):
+    obj = manifests._sorted_resources[0]
+    digest = _stamp(obj)
+    assert obj.metadata.annotations[HASH_ANNOTATION] == digest
+    assert _stamp(obj) == digest
+
+
+def _without_descriptions(value):
+    if isinstance(value, dict):
+        return {
+            k: _without_descriptions(v)
+            for k, v in value.items()
+            if not (k == "description" and isinstance(v, str))
+        }
+    if isinstance(value, list):
+        return [_without_descriptions(v) for v in value]
+    return value
+
+
+def test_strip_crd_descriptions(harness, ksp):
+    full = Manifests(harness.charm)._sorted_resources
+    harness.update_config({"strip-crd-descriptions": True})
+    stripped = Manifests(harness.charm)._sorted_resources
+
+    for before, after in zip(full, stripped):
+        before_size = len(json.dumps(before.to_dict()))
+        after_size = len(json.dumps(after.to_dict()))
+        log.info(f"{before.metadata.name}: {before_size} -> {after_size} bytes")
+        assert after_size < before_size
+        # only the descriptions are gone, every validating field is unchanged
+        assert after.to_dict() == _without_descriptions(before.to_dict())
+
+
+def test_strip_schema_keeps_properties_named_description():
+    schema = {
+        "description": "a thing",
+        "type": "object",
+        "required": ["description"],
+        "properties": {
+            "description": {"type": "string", "description": "what it is", "maxLength": 10},
+            "items": {"type": "array", "items": {"type": "string", "example": "x"}},
+        },
+    }
+    assert _strip_schema(schema) == {
+        "type": "object",
+        "required": ["description"],
+        "properties": {
+            "description": {"type": "string", "maxLength": 10},
+            "items": {"type": "array", "items": {"type": "string"}},
+        },
+    }
+
+
+def test_delete_collections(lightkube_client, manifests, caplog):
+    manifests.delete_manifest(ignore_not_found=True)
+    lightkube_client.delete.assert_not_called()
+    calls = lightkube_client._client.request.call_args_list
+    assert [c.kwargs["res"].__name__ for c in calls] == ["Queue", "CustomResourceDefinition"]
+    for c in calls:
+        assert c.args == ("deletecollection",)
+        assert c.kwargs["params"] == {"labelSelector": "juju.io/application=volcano-scheduler"}
+    assert [message for _, _, message in caplog.record_tuples] == [
+        "Deleted Queue collection (juju.io/application=volcano-scheduler)",
+        "Deleted CustomResourceDefinition collection (juju.io/application=volcano-scheduler)",
+    ]
+
+
+def test_delete_collections_fallback(harness, ksp, lightkube_client):
+    # lightkube's internals changed, so objects are deleted one at a time
+    del lightkube_client._client
+    harness.update_config({"queues": "batch"})
+    Manifests(harness.charm).delete_manifest(ignore_not_found=True)
+    deleted = [(c.args[0].__name__, c.args[1]) for c in lightkube_client.delete.call_args_list]
+    assert ("Queue", "batch") in deleted
+    assert ("CustomResourceDefinition", "queues.scheduling.volcano.sh") in deleted
+
+
+def test_delete_open_queues_rejected(harness, ksp, lightkube_client, caplog):
+    message = (
+        'admission webhook "validatequeue.volcano.sh" denied the request: only queue with '
+        "state `Closed` can be deleted, queue `batch` state is `Open`"
+    )
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message=message)
+    lightkube_client._client.request.side_effect = ApiError(response=mock_response)
+
+    def delete_se(kind, name, namespace=None):
+        if kind.__name__ == "Queue":
+            raise ApiError(response=mock_response)
+
+    lightkube_client.delete.side_effect = delete_se
+    harness.update_config({"queues": "batch"})
+    Manifests(harness.charm).delete_manifest(ignore_not_found=True, ignore_unauthorized=True)
+    deleted = [(c.args[0].__name__, c.args[1]) for c in lightkube_client.delete.call_args_list]
+    assert ("Queue", "batch") in deleted
+    assert ("CustomResourceDefinition", "queues.scheduling.volcano.sh") in deleted
+    assert f"Ignoring rejected queue delete: {message}" in caplog.text
+
+
+def test_unauthorized_delete_collections(lightkube_client, manifests, caplog):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock (unauthorized)")
+    lightkube_client._client.request.side_effect = ApiError(response=mock_response)
+    manifests.delete_manifest(ignore_unauthorized=True)
+    lightkube_client.delete.assert_not_called()
+    for _, _, message in caplog.record_tuples:
+        assert message == "Ignoring unauthorized error: Mock (unauthorized)"
+
+
+@pytest.fixture()
+def no_collections(lightkube_client):
+    # Deleting by label fails, so objects are deleted one at a time
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Method Not Allowed")
+    lightkube_client._client.request.side_effect = ApiError(response=mock_response)
+
+
+def test_successful_delete_resources(manifests, no_collections, caplog):
     manifests.delete_manifest(ignore_not_found=True)
-    _, _, first = caplog.record_tuples[0]
+    _, _, first = caplog.record_tuples[2]
     _, _, last = caplog.record_tuples[-1]
     assert first == "Deleted CustomResourceDefinition(commands.bus.volcano.sh, namespace=None)"
     assert last == "Deleted CustomResourceDefinition(queues.scheduling.volcano.sh, namespace=None)"
 
 
-def test_unfound_delete_resources(lightkube_client, manifests, caplog):
+def test_unfound_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict(message="Mock Not Found")
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     manifests.delete_manifest(ignore_not_found=True)
-    for _, _, message in caplog.record_tuples:
+    for _, _, message in caplog.record_tuples[2:]:
         assert message == "Ignoring not found error: Mock Not Found"
 
 
-def test_unauthorized_delete_resources(lightkube_client, manifests, caplog):
+def test_unauthorized_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict(message="Mock (unauthorized)")
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     manifests.delete_manifest(ignore_unauthorized=True)
-    for _, _, message in caplog.record_tuples:
+    for _, _, message in caplog.record_tuples[2:]:
         assert message == "Ignoring unauthorized error: Mock (unauthorized)"
 
 
-def test_unexpected_delete_resources(lightkube_client, manifests, caplog):
+def test_unexpected_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict(message="Mock Simple Failure")
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     with pytest.raises(ApiError):
         manifests.delete_manifest(ignore_unauthorized=True)
-    assert len(caplog.record_tuples) == 1
-    _, _, exception = caplog.record_tuples[0]
+    assert len(caplog.record_tuples) == 3
+    _, _, exception = caplog.record_tuples[2]
     assert (
         exception
         == "ApiError encountered while attempting to delete resource: Mock Simple Failure"
     )
 
 
-def test_no_message_delete_resources(lightkube_client, manifests, caplog):
+def test_no_message_delete_resources(lightkube_client, manifests, no_collections, caplog):
     mock_response = mock.MagicMock()
     mock_response.json.return_value = dict()
     error = ApiError(response=mock_response)
     lightkube_client.delete.side_effect = error
     with pytest.raises(ApiError):
         manifests.delete_manifest(ignore_unauthorized=True)
-    assert len(caplog.record_tuples) == 1
-    _, _, exception = caplog.record_tuples[0]
+    assert len(caplog.record_tuples) == 3
+    _, _, exception = caplog.record_tuples[2]
     assert exception == "ApiError encountered while attempting to delete resource."
+
+
+def test_apply_records_timings(lightkube_client, harness, ksp, manifest_timings, caplog):
+    caplog.set_level(logging.INFO)
+    harness.update_config({"manifest-timings": True})
+    Manifests(harness.charm).apply()
+    timings = read_timings(harness.charm.charm_dir)
+    by_operation = {}
+    for record in timings:
+        by_operation.setdefault(record["operation"], []).append(record)
+    assert set(by_operation) == {"render", "parse", "apply", "patch"}
+    assert len(by_operation["parse"]) == len(by_operation["apply"]) == 5
+    assert by_operation["patch"][0]["kind"] == "StatefulSet"
+    assert all(record["seconds"] >= 0 for record in timings)
+    assert "Timing operation=apply kind=CustomResourceDefinition" in caplog.text
+
+
+def test_timings_disabled(lightkube_client, manifests, manifest_timings):
+    manifests.apply()
+    manifests.delete_manifest()
+    assert manifests.timings.records == []
+    assert not manifest_timings.exists()
+
+
+@pytest.mark.parametrize(
+    "identity, holder",
+    [
+        ("volcano-scheduler-1_6f1c2e9a", "volcano-scheduler/1"),
+        ("some-host_6f1c2e9a", "some-host"),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_lease_holder(lightkube_client, manifests, identity, holder):
+    lightkube_client.get.return_value.spec.holderIdentity = identity
+    assert manifests.lease_holder() == holder
+    lightkube_client.get.assert_called_once_with(
+        Lease, "vc-scheduler", namespace=manifests.namespace
+    )
+
+
+def test_lease_holder_not_found(lightkube_client, manifests):
+    mock_response = mock.MagicMock()
+    mock_response.json.return_value = dict(message="Mock Not Found", code=404)
+    lightkube_client.get.side_effect = ApiError(response=mock_response)
+    assert manifests.lease_holder() is None
@@ -1,10 +1,12 @@
 import unittest.mock as mock
 
 import pytest
+import yaml
 from ops.pebble import ExecError
 
 from charm import CharmVolcano
-from scheduler import Scheduler, SchedulerArgs, SchedulerConfig
+from config import ConfigError, SchedulerPlugin, SchedulerPlugins
+from scheduler import CONFIG_FILE, Scheduler, SchedulerArgs, SchedulerConfig
 
 
 @pytest.fixture
@@ -24,12 +26,29 @@ def test_config_file(harness, scheduler):
     assert content.endswith("  - name: binpack\n")
 
 
+def test_config_file_plugin_options(harness, scheduler):
+    plugin = SchedulerPlugin(
+        name="binpack", enableNodeOrder=False, arguments={"binpack.weight": 10}
+    )
+    scheduler.config = SchedulerConfig(
+        actions="allocate", tiers=[SchedulerPlugins(plugins=[plugin])]
+    )
+    _, content = scheduler.config_file
+    assert yaml.safe_load(content)["tiers"] == [
+        {
+            "plugins": [
+                {"name": "binpack", "enableNodeOrder": False, "arguments": {"binpack.weight": 10}}
+            ]
+        }
+    ]
+
+
 def test_command(harness, scheduler):
     args = SchedulerArgs("false", "true", 1, {"extra": "args"})
     config = SchedulerConfig(actions="test, me", tiers=[])
 
     scheduler.apply(harness.charm, config, args)
-    cmd = "/vc-scheduler --logtostderr --scheduler-conf=/volcano.scheduler/volcano-scheduler.yaml --enable-healthz=false --enable-metrics=true -v=1 --extra='args' 2>&1"
+    cmd = "/vc-scheduler --logtostderr --scheduler-conf=/volcano.scheduler/volcano-scheduler.yaml --enable-healthz=false --enable-metrics=true -v=1 --minimum-feasible-nodes=100 --percentage-nodes-to-find=0 --schedule-period=1s --kube-api-qps=2000 --kube-api-burst=2000 --scheduler-name=volcano --lock-object-namespace=test_command --extra='args' 2>&1"
     assert scheduler.command == cmd
 
 
@@ -55,6 +74,48 @@ def test_restart(harness, scheduler):
     assert expected_plan == updated_plan
 
 
+@pytest.fixture
+def running(harness, scheduler):
+    harness.set_can_connect(CharmVolcano.CONTAINER, True)
+    container = harness.model.unit.get_container(CharmVolcano.CONTAINER)
+    scheduler.command = "mock_command"
+    scheduler.config = SchedulerConfig(actions="allocate", tiers=[])
+    scheduler.restart(container)
+    assert container.get_service("volcano").is_running()
+    with mock.patch.object(container, "restart") as mock_restart:
+        yield container, mock_restart
+
+
+def test_restart_reloads_config(running, scheduler):
+    container, mock_restart = running
+    scheduler.config = SchedulerConfig(actions="enqueue, allocate", tiers=[])
+    scheduler.restart(container)
+    mock_restart.assert_not_called()
+    assert container.pull(CONFIG_FILE).read().startswith("actions: enqueue, allocate\n")
+
+
+def test_restart_unchanged(running, scheduler):
+    container, mock_restart = running
+    with mock.patch.object(container, "push") as mock_push:
+        scheduler.restart(container)
+    mock_push.assert_not_called()
+    mock_restart.assert_not_called()
+
+
+def test_restart_command_changed(running, scheduler):
+    container, mock_restart = running
+    scheduler.command = "new_command"
+    scheduler.restart(container)
+    mock_restart.assert_called_once_with("volcano")
+
+
+def test_restart_stopped(running, scheduler):
+    container, mock_restart = running
+    container.stop("volcano")
+    scheduler.restart(container)
+    mock_restart.assert_called_once_with("volcano")
+
+
 def test_version_success(harness, scheduler):
     exec_response = """\
 API Version: v1alpha1
@@ -96,3 +157,54 @@ def test_version_failure(harness, scheduler, failure):
             mock_process.wait_output.return_value = (exec_response, None)
             version = scheduler.version(container)
     assert version == "Unknown"
+
+
+def test_command_kube_api_limits(harness, scheduler):
+    harness.update_config({"kube-api-qps": 500.5, "kube-api-burst": 1000})
+    args = SchedulerArgs.load(harness.charm)
+    scheduler.apply(harness.charm, SchedulerConfig.load(harness.charm), args)
+    assert " --kube-api-qps=500.5 --kube-api-burst=1000 " in scheduler.command
+
+
+def test_command_shard(harness, scheduler):
+    harness.update_config(
+        {"scheduler-name": "inference", "node-selector": "b.io/zone=z2, a.io/zone=z1 b.io/zone=z1"}
+    )
+    args = SchedulerArgs.load(harness.charm)
+    scheduler.apply(harness.charm, SchedulerConfig.load(harness.charm), args)
+    assert (
+        " --scheduler-name=inference --node-selector=b.io/zone:z2"
+        " --node-selector=a.io/zone:z1 --node-selector=b.io/zone:z1 "
+    ) in scheduler.command
+
+
+@pytest.mark.parametrize(
+    "config, flags",
+    [
+        ({}, " --scheduler-name=volcano --lock-object-namespace=test_command_leader_elect 2>&1"),
+        (
+            {"leader-elect": True},
+            " --leader-elect=true --lock-object-namespace=test_command_leader_elect 2>&1",
+        ),
+        ({"leader-elect": False}, " --scheduler-name=volcano --leader-elect=false 2>&1"),
+    ],
+)
+def test_command_leader_elect(harness, scheduler, config, flags):
+    harness.update_config(config)
+    args = SchedulerArgs.load(harness.charm)
+    scheduler.apply(harness.charm, SchedulerConfig.load(harness.charm), args)
+    assert scheduler.command.endswith(flags)
+    assert "--leader-elect-" not in scheduler.command
+
+
+@pytest.mark.parametrize(
+    "config, message",
+    [
+        ({"kube-api-qps": 0.0}, "kube-api-qps must be greater than 0"),
+        ({"kube-api-burst": 0}, "kube-api-burst must be at least 1"),
+    ],
+)
+def test_kube_api_limits_invalid(harness, config, message):
+    harness.update_config(config)
+    with pytest.raises(ConfigError, match=message):
+        SchedulerArgs.load(harness.charm)